@@ -0,0 +1,162 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+"""各波特率下的命令吞吐量测试
+
+用本地伪终端（pty）模拟电源：按波特率模拟每个字节的线路传输时间，
+并从从端的 termios 设置读取主机的波特率，两端速率不一致时丢弃收到的数据，
+以此测试波特率协商与回退。仅用于 Linux/macOS。
+
+    python baud_benchmark.py [--count 200] [--max-baudrate 460800]
+"""
+
+import argparse
+import os
+import pty
+import termios
+import threading
+import time
+import tty
+
+from scpi_session import BAUD_COMMAND, ScpiTransport
+
+BAUD_RATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+
+
+class PtyDevice:
+    """pty 上的模拟电源，支持 *IDN?、VOLT?、CURR? 和波特率切换命令"""
+
+    # 新速率下链路不通时，设备回到原速率的等待时间（秒）
+    revert_timeout = 1.0
+
+    def __init__(self, baudrate=115200, max_baudrate=921600):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.baudrate = baudrate
+        self.max_baudrate = max_baudrate
+        self.commands = 0
+        self._speeds = {getattr(termios, f"B{rate}"): rate
+                        for rate in BAUD_RATES if hasattr(termios, f"B{rate}")}
+        self._revert = None  # (原速率, 回退时间)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._running = False
+        os.close(self.master)
+        os.close(self.slave)
+
+    def _host_baudrate(self):
+        return self._speeds.get(termios.tcgetattr(self.slave)[5])
+
+    def _link_ok(self):
+        return self.baudrate <= self.max_baudrate and self._host_baudrate() == self.baudrate
+
+    def _byte_time(self, count):
+        # 8N1：每字节10位
+        return count * 10 / self.baudrate
+
+    def _run(self):
+        buffer = b""
+        while self._running:
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                return
+            # 以读到数据时主机的速率为准
+            link_ok = self._link_ok()
+            time.sleep(self._byte_time(len(data)))
+
+            if self._revert is not None and time.monotonic() > self._revert[1]:
+                self.baudrate, self._revert = self._revert[0], None
+                link_ok = self._link_ok()
+            if not link_ok:
+                # 速率不一致：收到的是乱码
+                buffer = b""
+                continue
+            self._revert = None
+
+            buffer += data
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                self._handle(line.decode('ascii', errors='replace').strip())
+
+    def _handle(self, line):
+        if not line:
+            return
+        self.commands += 1
+        responses = []
+        for command in line.split(";"):
+            command = command.strip().lstrip(":").upper()
+            if command == "*IDN?":
+                responses.append("GYY,PSU-SIM,0,1.0")
+            elif command in ("VOLT?", "MEAS:VOLT?"):
+                responses.append("1.234500")
+            elif command in ("CURR?", "MEAS:CURR?"):
+                responses.append("0.500000")
+            elif command.startswith(BAUD_COMMAND):
+                # 回复发送完成后切换，并在超时后回退
+                self._revert = (self.baudrate, time.monotonic() + self.revert_timeout)
+                self.baudrate = int(command.split()[1])
+        if responses:
+            response = (";".join(responses) + "\r\n").encode('ascii')
+            time.sleep(self._byte_time(len(response)))
+            if self._link_ok():
+                os.write(self.master, response)
+
+
+def measure(transport, count):
+    """单条查询与复合查询的每秒命令数"""
+    start = time.perf_counter()
+    for _ in range(count):
+        transport.send("VOLT?")
+    single = count / (time.perf_counter() - start)
+
+    commands = ["VOLT?", "CURR?"] * 4
+    start = time.perf_counter()
+    for _ in range(count // len(commands)):
+        transport.send_batch(commands)
+    batched = (count // len(commands) * len(commands)) / (time.perf_counter() - start)
+    return single, batched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="各波特率下的SCPI命令吞吐量")
+    parser.add_argument("--count", type=int, default=200, help="每种速率的查询次数")
+    parser.add_argument("--max-baudrate", type=int, default=460800, help="模拟设备支持的最高波特率")
+    args = parser.parse_args()
+
+    print(f"{'波特率':>8} {'单条 cmd/s':>12} {'复合 cmd/s':>12}")
+    for rate in BAUD_RATES:
+        if rate > args.max_baudrate:
+            break
+        device = PtyDevice(baudrate=rate, max_baudrate=args.max_baudrate)
+        transport = ScpiTransport()
+        try:
+            transport.open(device.port, baudrate=rate)
+            single, batched = measure(transport, args.count)
+            print(f"{rate:>8} {single:>12.1f} {batched:>12.1f}")
+        finally:
+            transport.close()
+            device.close()
+
+    # 从 115200 开始协商，超过设备上限的速率应回退
+    device = PtyDevice(baudrate=115200, max_baudrate=args.max_baudrate)
+    transport = ScpiTransport(log=print)
+    try:
+        transport.open(device.port, baudrate=115200)
+        start = time.perf_counter()
+        rate = transport.negotiate_baudrate()
+        print(f"协商结果: {rate} (用时 {time.perf_counter() - start:.2f} s)")
+        single, batched = measure(transport, args.count)
+        print(f"{rate:>8} {single:>12.1f} {batched:>12.1f}")
+    finally:
+        transport.close()
+        device.close()
+
+
+if __name__ == "__main__":
+    main()
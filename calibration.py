@@ -0,0 +1,194 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+import time
+
+import numpy as np
+
+from scpi_numeric import parse_number
+
+
+class CalibrationTable:
+    """校准参数表：参数号 1..N 对应的值（float64），缺失的参数为 NaN"""
+
+    def __init__(self, values, elapsed=None):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.elapsed = elapsed  # 从设备读取的耗时（秒）
+
+    @classmethod
+    def from_responses(cls, responses, elapsed=None):
+        """由 *RCL 1..N 的响应文本构造，无响应或无法解析的参数为 NaN"""
+        values = [parse_number(response) if response is not None else None for response in responses]
+        return cls([np.nan if value is None else value for value in values], elapsed)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        """按参数号（从1开始）取值"""
+        return float(self.values[index - 1])
+
+    def get(self, index):
+        """按参数号取值，缺失时返回 None"""
+        value = self.values[index - 1]
+        return None if np.isnan(value) else float(value)
+
+    def items(self):
+        """(参数号, 值) 序列"""
+        return [(index, float(value)) for index, value in enumerate(self.values, 1)]
+
+    def missing(self):
+        """未能读取的参数号"""
+        return [int(index) + 1 for index in np.flatnonzero(np.isnan(self.values))]
+
+    @property
+    def complete(self):
+        return not np.isnan(self.values).any()
+
+    def save(self, path):
+        """保存为文本文件（每行一个参数值）"""
+        np.savetxt(path, self.values, fmt="%.6f")
+
+    @classmethod
+    def load(cls, path):
+        """从 save() 保存的文件读取"""
+        return cls(np.loadtxt(path, dtype=np.float64, ndmin=1))
+
+
+class CalibrationUpload:
+    """批量写入校准参数的结果"""
+
+    def __init__(self, changed, mismatched, elapsed):
+        self.changed = changed  # 实际写入的参数号
+        self.mismatched = mismatched  # 读回校验不一致的参数号
+        self.elapsed = elapsed  # 总耗时（秒）
+
+    @property
+    def verified(self):
+        return not self.mismatched
+
+
+def download_calibration(send_batch, count, cache=None):
+    """用尽量少的复合请求（*RCL 1;*RCL 2;...）读取全部 count 个校准参数
+
+    send_batch(commands) 返回与 commands 对应的响应列表；cache 不为 None 时同时更新缓存。
+    返回 CalibrationTable，elapsed 为总耗时。
+    """
+    commands = [f"*RCL {index}" for index in range(1, count + 1)]
+    start = time.perf_counter()
+    responses = send_batch(commands)
+    table = CalibrationTable.from_responses(responses, time.perf_counter() - start)
+    if cache is not None:
+        for command, response in zip(commands, responses):
+            cache.update(command, response)
+    return table
+
+
+def upload_calibration(send_batch, target, cache, tolerance=5e-7):
+    """把目标校准表写入设备，只写入与设备当前值不同的参数
+
+    cache 为 send_batch 所经过的校准参数缓存（如 transport.calibration）。设备当前值优先
+    取自缓存，未缓存的参数用一次批量请求读取；变化的参数用批量 *SAV 写入，
+    再用一次批量 *RCL 读回校验。耗时取决于变化的参数个数而不是表的大小。
+    返回 CalibrationUpload。
+    """
+    start = time.perf_counter()
+    indexes = range(1, len(target) + 1)
+    current = cache.load(send_batch, indexes)
+
+    changed = []
+    for index in indexes:
+        value = target.get(index)
+        if value is None:
+            continue
+        old = parse_number(current[index]) if current[index] is not None else None
+        if old is None or abs(old - value) > tolerance:
+            changed.append(index)
+    if not changed:
+        return CalibrationUpload([], [], time.perf_counter() - start)
+
+    commands = [f"*SAV {index},{target[index]:.6f}" for index in changed]
+    results = send_batch(commands)
+    for command, result in zip(commands, results):
+        cache.update(command, result)
+
+    # 读回校验必须访问设备，先丢弃写穿的缓存值
+    cache.forget(changed)
+    readback = cache.load(send_batch, changed)
+    mismatched = []
+    for index in changed:
+        value = parse_number(readback[index]) if readback[index] is not None else None
+        if value is None or abs(value - target[index]) > tolerance:
+            mismatched.append(index)
+    return CalibrationUpload(changed, mismatched, time.perf_counter() - start)
+
+
+class CalibrationCache:
+    """校准参数缓存
+
+    *RCL n 读取优先使用本地缓存，*SAV n,value 成功后写穿更新缓存。
+    校准参数保存在设备非易失存储中，*RST 不影响；更换连接时需 invalidate()。
+    """
+
+    def __init__(self):
+        self.values = {}  # 参数号 -> 响应文本
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def parse(command):
+        """解析 *RCL/*SAV 命令，返回 (命令, 参数号, 参数值文本)，其他命令返回 None"""
+        command = command.strip()
+        header = command[:4].upper()
+        if header not in ("*RCL", "*SAV"):
+            return None
+        arguments = command[4:].split(",", 1)
+        try:
+            index = int(arguments[0])
+        except ValueError:
+            return None
+        value = arguments[1].strip() if len(arguments) > 1 else None
+        return header, index, value
+
+    def lookup(self, command):
+        """*RCL 命中缓存时返回缓存的响应，否则返回 None"""
+        parsed = self.parse(command)
+        if parsed is None or parsed[0] != "*RCL":
+            return None
+        if parsed[1] in self.values:
+            self.hits += 1
+            return self.values[parsed[1]]
+        self.misses += 1
+        return None
+
+    def update(self, command, response):
+        """根据命令和设备响应更新缓存（响应为 None 表示失败）"""
+        parsed = self.parse(command)
+        if parsed is None or response is None:
+            return
+        header, index, value = parsed
+        if header == "*RCL":
+            self.values[index] = response
+        elif value is not None:
+            self.values[index] = value
+
+    def invalidate(self):
+        """清空缓存"""
+        self.values.clear()
+
+    def forget(self, indexes):
+        """丢弃指定参数的缓存"""
+        for index in indexes:
+            self.values.pop(index, None)
+
+    def load(self, send_batch, indexes):
+        """用一次批量请求读取尚未缓存的参数，返回 {参数号: 响应}
+
+        send_batch(commands) 把命令合并为复合命令发送，返回与 commands 对应的响应列表。
+        """
+        commands = [f"*RCL {index}" for index in indexes if index not in self.values]
+        if commands:
+            for command, response in zip(commands, send_batch(commands)):
+                self.update(command, response)
+        return {index: self.values.get(index) for index in indexes}
@@ -0,0 +1,173 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Signal
+
+from calibration import upload_calibration
+from scpi_session import PRIORITY_NORMAL, ScpiSession, ScpiTransport, command_priority
+
+
+class Identity:
+    """*IDN? 响应：厂商,型号,序列号,固件版本（缺少的字段为空字符串）"""
+
+    def __init__(self, response):
+        self.response = response
+        fields = [field.strip() for field in response.split(",")] + [""] * 4
+        self.manufacturer, self.model, self.serial, self.firmware = fields[:4]
+
+    def __str__(self):
+        return f"{self.manufacturer} {self.model} 序列号 {self.serial} 固件 {self.firmware}"
+
+
+def probe_port(port, baudrate=115200, timeout=0.5):
+    """打开端口并探测设备标识，返回 *IDN? 响应
+
+    只发送 *IDN?：timeout 内按短间隔重复发送（刚打开的端口可能使设备复位），
+    一应答即返回。无应答、端口无法打开或写入出错时返回 None。
+    """
+    transport = ScpiTransport(auto_reconnect=False)
+    try:
+        transport.open(port, baudrate, timeout)
+        return transport.wait_ready(deadline=timeout) or None
+    except Exception:
+        return None
+    finally:
+        transport.close()
+
+
+def identify_ports(ports, baudrate=115200, timeout=0.5):
+    """同时探测所有端口，返回 {端口: Identity}，无应答的端口被跳过
+
+    每个端口一个线程，总耗时约为一个 timeout，与端口数无关。
+    """
+    ports = list(ports)
+    if not ports:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        responses = pool.map(lambda port: probe_port(port, baudrate, timeout), ports)
+        return {port: Identity(response) for port, response in zip(ports, responses) if response}
+
+
+class InstrumentManager(QObject):
+    """多仪器管理器
+
+    每个串口对应一个 ScpiSession（各自独立的I/O线程）。扇出操作同时提交到
+    所有会话并并发等待，整批操作的耗时约为一次往返，而不是N次。
+    """
+
+    message = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sessions = {}  # 端口 -> ScpiSession
+
+    @property
+    def ports(self):
+        return list(self.sessions)
+
+    def add(self, port):
+        """为端口创建会话（尚未打开串口）"""
+        if port in self.sessions:
+            return self.sessions[port]
+        session = ScpiSession(self)
+        session.message.connect(lambda message, port=port: self.message.emit(f"[{port}] {message}"))
+        self.sessions[port] = session
+        return session
+
+    def remove(self, port):
+        """停止并移除端口的会话"""
+        session = self.sessions.pop(port, None)
+        if session is not None:
+            session.shutdown()
+            # 先解除父子关系，避免管理器销毁时重复删除会话
+            session.setParent(None)
+            session.deleteLater()
+
+    async def gather(self, jobs, priority=PRIORITY_NORMAL):
+        """并发执行 {端口: job(transport)}，返回 {端口: 结果}；出错的端口结果为 None"""
+        ports = [port for port in jobs if port in self.sessions]
+        return await self._collect(ports, (self.sessions[port].run(jobs[port], priority) for port in ports))
+
+    async def _collect(self, ports, awaitables):
+        results = await asyncio.gather(*awaitables, return_exceptions=True)
+
+        gathered = {}
+        for port, result in zip(ports, results):
+            if isinstance(result, BaseException):
+                self.message.emit(f"[{port}] 命令执行错误: {str(result)}")
+                result = None
+            gathered[port] = result
+        return gathered
+
+    async def run_all(self, job, priority=PRIORITY_NORMAL):
+        """在所有仪器上并发执行同一任务 job(transport)"""
+        return await self.gather({port: job for port in self.sessions}, priority)
+
+    async def connect_all(self, ports, baudrate=115200, timeout=0.5, negotiate=False):
+        """并发打开并初始化多个串口，返回 {端口: 设备标识}
+
+        打开失败或设备无应答的端口被移除，不会收到初始化命令。
+        """
+        for port in ports:
+            self.add(port)
+
+        def connect(port):
+            return lambda transport: transport.connect(port, baudrate, timeout, negotiate)
+
+        results = await self.gather({port: connect(port) for port in ports})
+        for port, idn in results.items():
+            if not idn:
+                self.remove(port)
+        return {port: idn for port, idn in results.items() if idn}
+
+    async def disconnect_all(self):
+        """所有仪器切回本地控制并关闭"""
+        def disconnect(transport):
+            # 断线时不再重连
+            if transport.online:
+                transport.send("SYST:LOC")
+            transport.close()
+
+        await self.run_all(disconnect)
+        self.shutdown()
+
+    async def send_all(self, command):
+        """向所有仪器发送同一命令，返回 {端口: 响应}"""
+        return await self.run_all(lambda transport: transport.send(command), command_priority(command))
+
+    async def batch_all(self, commands):
+        """向所有仪器发送同一组命令（合并为复合命令），返回 {端口: 结果列表}"""
+        commands = list(commands)
+        priority = min((command_priority(command) for command in commands), default=PRIORITY_NORMAL)
+        return await self.run_all(lambda transport: transport.send_batch(commands), priority)
+
+    async def query_all(self, command, kind="text"):
+        """从所有仪器读取同一查询，返回 {端口: 响应}
+
+        与同一会话上其他调用者的相同查询合并，共享一次串口往返。
+        """
+        ports = list(self.sessions)
+        return await self._collect(ports, (self.sessions[port].read(command, kind) for port in ports))
+
+    async def set_voltage_all(self, voltage):
+        """所有仪器设置同一电压"""
+        return await self.send_all(f"SOURce:VOLTage:DC {voltage:.6f}")
+
+    async def set_current_all(self, current):
+        """所有仪器设置同一电流"""
+        return await self.send_all(f"SOURce:CURRent:DC {current:.6f}")
+
+    async def upload_calibration_all(self, table):
+        """把同一校准表并发写入所有仪器（只写变化的参数并读回校验），返回 {端口: CalibrationUpload}"""
+        return await self.run_all(
+            lambda transport: upload_calibration(transport.send_batch, table, transport.calibration)
+        )
+
+    def shutdown(self):
+        """停止所有会话线程并关闭串口"""
+        for port in list(self.sessions):
+            self.remove(port)
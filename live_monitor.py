@@ -0,0 +1,160 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+import collections
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+
+from scpi_session import PRIORITY_POLL
+
+# 每个样本的列：时间戳（Unix 秒）、电压、电流
+SAMPLE_COLUMNS = ("time", "voltage", "current")
+TEMPERATURE_COMMAND = "SYST:TEMP?"
+
+
+class LiveMonitor(QObject):
+    """实测电压/电流的后台监视
+
+    监视线程按目标采样率向会话提交 VOLT?;CURR? 复合查询（轮询优先级，
+    不影响控制命令），同一时刻最多一个查询在排队或执行。链路跟不上目标速率时
+    连续采样，即链路允许的最高速率。样本按 publish_interval 成批以 samples
+    信号发布，数据为 (n, 列数) 数组，列名见 columns，无效读数为 NaN。
+    轮询用 submit() 而不经过 session.query() 合并：复合查询与单条 VOLT?/CURR?
+    不是同一条查询，不会命中合并；监视线程本身保证最多一个轮询在途，且串口离线时
+    不发送（由重连逻辑处理），这些都需要自定义的任务。
+    """
+
+    commands = ("VOLT?", "CURR?")
+    columns = SAMPLE_COLUMNS
+    # 样本发布间隔（秒）：高采样率时按批通知，GUI线程不会被逐个样本的信号淹没
+    publish_interval = 0.05
+
+    samples = Signal(object)
+
+    def __init__(self, session, parent=None, rate=10.0):
+        super().__init__(parent)
+        self.session = session
+        self._intervals = collections.deque(maxlen=512)  # 最近的采样间隔（秒）
+        self.rate = rate
+        self.latest = None  # 最近一个样本，各项对应 columns
+        self.count = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def rate(self):
+        """目标采样率（Hz），运行中修改立即生效并重新统计采样率和抖动"""
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate):
+        self._rate = rate
+        self._intervals.clear()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, rate=None):
+        """开始采样，重新统计采样率和抖动"""
+        if rate is not None:
+            self.rate = rate
+        if self._thread is None:
+            self.count = 0
+            self.errors = 0
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止采样（等待进行中的查询结束）"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def measure_temperature(self, enabled):
+        """是否同时采样温度（每个样本多一项查询，会降低最高采样率）；停止时修改"""
+        if enabled:
+            self.commands = LiveMonitor.commands + (TEMPERATURE_COMMAND,)
+            self.columns = SAMPLE_COLUMNS + ("temperature",)
+        else:
+            self.commands = LiveMonitor.commands
+            self.columns = SAMPLE_COLUMNS
+
+    def stats(self):
+        """(实际采样率 Hz, 抖动 ms)：按最近的采样间隔计算，抖动为间隔的标准差"""
+        intervals = np.array(self._intervals)
+        if len(intervals) < 2:
+            return 0.0, 0.0
+        return 1.0 / intervals.mean(), intervals.std() * 1000
+
+    def _measure(self, transport):
+        """在会话工作线程中读取一次实测值；串口不可用时不发送（由重连逻辑处理）"""
+        if not transport.online:
+            return None
+        return transport.query_floats(self.commands, quiet=True)
+
+    def _poll(self):
+        """提交一次查询并等待结果，返回 (开始时间, 结束时间, 读数)；停止时返回 None"""
+        start = time.perf_counter()
+        future = self.session.submit(self._measure, None, None, PRIORITY_POLL)
+        while True:
+            try:
+                values = future.result(timeout=0.1)
+                break
+            except FutureTimeout:
+                if self._stop.is_set():
+                    future.cancel()
+                    return None
+            except Exception:
+                values = None
+                break
+        return start, time.perf_counter(), values
+
+    def _run(self):
+        # perf_counter 精度高但没有绝对零点：换算成 Unix 时间戳
+        epoch = time.time() - time.perf_counter()
+        pending = []
+        last_time = None
+        next_time = last_publish = time.perf_counter()
+        while not self._stop.is_set():
+            rate = self._rate
+            polled = self._poll()
+            if polled is None:
+                break
+            start, end, values = polled
+            if values is None:
+                self.errors += 1
+            else:
+                # 取往返的中点作为采样时刻；修改采样率后重新统计
+                sampled = (start + end) / 2
+                if last_time is not None and rate == self._rate:
+                    self._intervals.append(sampled - last_time)
+                last_time = sampled
+                sample = (epoch + sampled,) + tuple(np.nan if value is None else value for value in values)
+                pending.append(sample)
+                self.latest = sample
+                self.count += 1
+
+            now = time.perf_counter()
+            if pending and now - last_publish >= self.publish_interval:
+                self.samples.emit(np.array(pending, dtype=np.float64))
+                pending = []
+                last_publish = now
+
+            next_time += 1.0 / rate
+            delay = next_time - now
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                # 跟不上目标速率：不累积欠下的采样，立即开始下一次
+                next_time = now
+        if pending:
+            self.samples.emit(np.array(pending, dtype=np.float64))
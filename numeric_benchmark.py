@@ -0,0 +1,64 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+"""数值响应解析的微基准测试
+
+对比原来每次调用 import re + re.search 的写法与 scpi_numeric 中的共享解析器。
+
+    python numeric_benchmark.py [--count 100000] [--size 10000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from scpi_numeric import parse_array, parse_number, parse_numbers
+
+
+def legacy_parse(response):
+    """原写法：每次调用导入 re 并搜索（不支持指数格式）"""
+    import re
+    value_match = re.search(r'[-+]?\d*\.?\d+', response)
+    if value_match:
+        return float(value_match.group())
+    return None
+
+
+def timeit(function, argument, count):
+    """平均每次调用耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(count):
+        function(argument)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数值响应解析耗时")
+    parser.add_argument("--count", type=int, default=100000, help="单值解析的重复次数")
+    parser.add_argument("--size", type=int, default=10000, help="列表解析的数值个数")
+    args = parser.parse_args()
+
+    print("单个数值（微秒/次）")
+    for response in ("1.234500", "1.2E-3", "25.5C"):
+        legacy = timeit(legacy_parse, response, args.count)
+        shared = timeit(parse_number, response, args.count)
+        raw = timeit(parse_number, memoryview(response.encode('ascii') + b"\r\n"), args.count)
+        print(f"  {response:>10}: re.search {legacy:6.2f}  parse_number {shared:6.2f}  "
+              f"memoryview {raw:6.2f}  结果 {legacy_parse(response)} / {parse_number(response)}")
+
+    values = np.random.default_rng(0).normal(0, 1e-3, args.size)
+    response = ",".join(f"{value:.6E}" for value in values).encode('ascii') + b"\r\n"
+    repeat = max(1, args.count // args.size)
+    print(f"{args.size} 个数值的列表（毫秒/次）")
+    legacy = timeit(lambda data: [legacy_parse(item) for item in data.decode('ascii').split(",")],
+                    response, repeat) / 1000
+    listed = timeit(parse_numbers, response, repeat) / 1000
+    vectorized = timeit(parse_array, response, repeat) / 1000
+    print(f"  re.search 逐个 {legacy:6.2f}  parse_numbers {listed:6.2f}  parse_array {vectorized:6.2f}")
+    print(f"  parse_array 最大误差: {np.max(np.abs(parse_array(response) - values)):.3g}")
+
+
+if __name__ == "__main__":
+    main()
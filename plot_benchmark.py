@@ -0,0 +1,81 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+"""实时曲线的帧耗时测试
+
+向 TraceBuffer 写入不同数量的样本，分别测量追加新样本后增量重绘一帧、
+以及修改时间跨度后整体重新计算一帧的耗时。1 亿个样本约需 2 GB 内存。
+
+    python plot_benchmark.py [--max-points 10000000] [--width 1000]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+
+from trace_plot import TraceBuffer, TracePlot
+
+RATE = 1000.0  # 模拟采样率（Hz）
+
+
+def fill(buffer, count, rng, batch=1 << 20):
+    """按 RATE 写入 count 个随机游走样本"""
+    start = len(buffer)
+    while len(buffer) < count:
+        size = min(batch, count - len(buffer))
+        times = (start + np.arange(size)) / RATE
+        values = np.cumsum(rng.normal(0, 1e-4, (size, 2)), axis=0)
+        buffer.append(np.column_stack([times, values]))
+        start += size
+
+
+def frame(plot):
+    """绘制一帧，返回耗时（毫秒）"""
+    start = time.perf_counter()
+    plot.grab()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="实时曲线帧耗时")
+    parser.add_argument("--max-points", type=float, default=1e7, help="最多写入的样本数")
+    parser.add_argument("--width", type=int, default=1000, help="曲线宽度（像素）")
+    args = parser.parse_args()
+
+    app = QApplication([])
+    rng = np.random.default_rng(0)
+    buffer = TraceBuffer(2)
+    plot = TracePlot(buffer, ("电压(V)", "电流(mA)"))
+    plot.resize(args.width + plot.margin + 10, 400)
+
+    print(f"{'样本数':>12} {'增量帧 ms':>10} {'60 s 重算 ms':>12} {'全部重算 ms':>12}")
+    count = 1000
+    while count <= args.max_points:
+        fill(buffer, count, rng)
+
+        # 跟随最新数据：每帧追加 50 个样本后增量重绘
+        plot.set_span(60.0)
+        frame(plot)
+        incremental = []
+        for _ in range(20):
+            fill(buffer, len(buffer) + 50, rng)
+            incremental.append(frame(plot))
+
+        plot.set_span(60.0)
+        recompute = frame(plot)
+        plot.set_span(None)
+        everything = frame(plot)
+        print(f"{len(buffer):>12} {np.median(incremental):>10.2f} {recompute:>12.2f} {everything:>12.2f}")
+        count *= 10
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+import os
+import threading
+
+import serial.tools.list_ports
+from PySide6.QtCore import QObject, Signal
+
+try:
+    import winreg
+except ImportError:
+    winreg = None
+
+SERIALCOMM_KEY = r"HARDWARE\DEVICEMAP\SERIALCOMM"
+
+
+def device_nodes():
+    """当前串口设备名的快照（开销很小，用于判断是否需要重新枚举串口）
+
+    Windows 读取注册表 SERIALCOMM 中存在的 COM 口，其他系统列出 /dev 下的设备节点；
+    都无法读取时返回 None。
+    """
+    if winreg is not None:
+        try:
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, SERIALCOMM_KEY) as key:
+                count = winreg.QueryInfoKey(key)[1]
+                return tuple(sorted(str(winreg.EnumValue(key, index)[1]) for index in range(count)))
+        except FileNotFoundError:
+            # 没有任何串口时该键不存在
+            return ()
+        except OSError:
+            return None
+    try:
+        return tuple(sorted(name for name in os.listdir("/dev") if name.startswith(("tty", "cu."))))
+    except OSError:
+        return None
+
+
+def port_key(port):
+    """设备的稳定标识：USB 设备用 VID:PID:序列号（重新插入后端口名可能改变），否则用端口名"""
+    if port.serial_number:
+        return f"{port.vid or 0:04X}:{port.pid or 0:04X}:{port.serial_number}"
+    return port.device
+
+
+class PortWatcher(QObject):
+    """串口热插拔监视
+
+    后台线程每 interval 秒检查一次设备名快照（fingerprint），有变化时才重新枚举串口，
+    与上次的结果比较后发出 changed(新增列表, 移除列表)，元素为 comports() 返回的端口信息。
+    没有可用的快照时只能每次都枚举，开销较大，改为每 scan_interval 秒一次。
+    """
+
+    changed = Signal(object, object)
+
+    def __init__(self, parent=None, interval=0.25, scan=serial.tools.list_ports.comports,
+                 fingerprint=device_nodes, scan_interval=2.0):
+        super().__init__(parent)
+        self.interval = interval
+        self.scan_interval = scan_interval
+        self.scan = scan
+        self.fingerprint = fingerprint
+        self.ports = {}  # 端口名 -> 端口信息（整体替换，GUI线程可直接读取）
+        self._last = None
+        self._settling = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动监视线程，首次扫描的全部端口作为新增端口通知"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                pass
+            # 上一轮没有得到设备名快照时放慢轮询
+            if self._stop.wait(self.interval if self._last is not None else self.scan_interval):
+                break
+
+    def poll(self, force=False):
+        """检查一次端口变化，返回 (新增列表, 移除列表)；可在任意线程调用
+
+        force 为 True 时不论设备节点是否变化都重新枚举。
+        """
+        with self._lock:
+            snapshot = self.fingerprint() if self.fingerprint is not None else None
+            changed = snapshot is None or snapshot != self._last
+            if not force and not changed and not self._settling:
+                return [], []
+            # 设备节点可能先于枚举结果更新：节点变化后的下一轮再枚举一次
+            self._settling = changed
+            self._last = snapshot
+
+            ports = {port.device: port for port in self.scan()}
+            added = [port for device, port in ports.items() if device not in self.ports]
+            removed = [port for device, port in self.ports.items() if device not in ports]
+            self.ports = ports
+        if added or removed:
+            self.changed.emit(added, removed)
+        return added, removed
@@ -0,0 +1,216 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+"""采集数据录制：只追加的二进制文件
+
+文件格式：
+    8 字节标识 GYYREC01 + 4 字节头部长度（小端 uint32）
+    JSON 头部：设备标识（*IDN?）、校准参数表、列名、记录类型等，用空格补齐到 4096 字节的整数倍
+    之后是定长记录，每条记录为各列的小端 float64
+
+记录数由文件大小得出（不完整的末尾记录被忽略），因此写入中断也不会损坏已写入的数据。
+读取时用 numpy.memmap 映射记录区，不把文件整个读入内存。
+
+    python recorder.py session.rec    # 显示录制文件的摘要
+"""
+
+import argparse
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+from calibration import CalibrationTable
+from timeseries import STORE_COLUMNS
+
+MAGIC = b"GYYREC01"
+HEADER_ALIGNMENT = 4096
+RECORD_TYPE = "<f8"
+
+
+def record_dtype(columns):
+    """每条记录的结构化类型：每列一个小端 float64 字段"""
+    return np.dtype([(name, RECORD_TYPE) for name in columns])
+
+
+class SessionRecorder:
+    """录制器：write() 只把样本放入队列，由后台写入线程合并后顺序写入文件
+
+    columns 为文件的列（默认与实时数据存储相同）；write() 的样本按列名对应，缺少的列写入 NaN。
+    写入线程每 flush_interval 秒把缓冲的数据写到磁盘，之后即可被读取。
+    """
+
+    flush_interval = 1.0
+
+    def __init__(self, path, identity="", calibration=None, columns=STORE_COLUMNS, metadata=None):
+        self.path = path
+        self.columns = tuple(columns)
+        self._rows = {name: row for row, name in enumerate(self.columns)}
+        self.records = 0
+        self.error = None  # 写入线程遇到的异常
+        header = {
+            "identity": identity,
+            "calibration": ([None if np.isnan(value) else float(value) for value in calibration.values]
+                            if calibration is not None else []),
+            "columns": list(self.columns),
+            "record_type": RECORD_TYPE,
+            "created": time.time(),
+        }
+        header.update(metadata or {})
+
+        self._file = open(path, "wb")
+        self._file.write(encode_header(header))
+        self._file.flush()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def bytes_written(self):
+        return self.records * len(self.columns) * 8
+
+    def write(self, samples, columns=None):
+        """提交 (n, k) 样本数组（k 列的列名为 columns，默认为文件的列），不等待写入
+
+        写入线程已因磁盘错误停止时抛出该错误。
+        """
+        if self.error is not None:
+            raise self.error
+        samples = np.atleast_2d(np.asarray(samples, dtype=np.float64))
+        if columns is not None and tuple(columns) != self.columns:
+            records = np.full((len(samples), len(self.columns)), np.nan)
+            records[:, [self._rows[name] for name in columns]] = samples
+            samples = records
+        self._queue.put(samples)
+
+    def close(self):
+        """写完队列中的样本后关闭文件"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            try:
+                self._file.close()
+            except OSError as e:
+                self.error = self.error or e
+
+    def _run(self):
+        last_flush = time.monotonic()
+        running = True
+        while running:
+            try:
+                batches = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batches = []
+            # 合并已排队的批次，一次写入
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for index, batch in enumerate(batches):
+                if batch is None:
+                    running = False
+                    batches = batches[:index]
+                    break
+            try:
+                for batch in batches:
+                    self._file.write(np.ascontiguousarray(batch, dtype=RECORD_TYPE).tobytes())
+                    self.records += len(batch)
+                if not running or time.monotonic() - last_flush >= self.flush_interval:
+                    self._file.flush()
+                    last_flush = time.monotonic()
+            except OSError as e:
+                self.error = e
+                running = False
+
+
+def encode_header(header):
+    """标识 + 头部长度 + JSON 头部，补齐到 HEADER_ALIGNMENT 的整数倍，使记录区按页对齐"""
+    body = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    size = len(MAGIC) + 4 + len(body)
+    body += b" " * (-size % HEADER_ALIGNMENT)
+    return MAGIC + struct.pack("<I", len(body)) + body
+
+
+class Recording:
+    """已录制的文件：records 为映射到文件的结构化数组（只读），按列名取出各列"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"不是录制文件: {path}")
+            (length,) = struct.unpack("<I", file.read(4))
+            self.header = json.loads(file.read(length))
+        self.offset = len(MAGIC) + 4 + length
+        self.columns = tuple(self.header["columns"])
+        self.dtype = record_dtype(self.columns)
+        count = (os.path.getsize(path) - self.offset) // self.dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=self.offset, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def identity(self):
+        return self.header.get("identity", "")
+
+    @property
+    def calibration(self):
+        """校准参数表（CalibrationTable），缺失的参数为 NaN"""
+        return CalibrationTable([np.nan if value is None else value for value in self.header["calibration"]])
+
+    def column(self, name):
+        """某一列（映射到文件的视图，访问时才从磁盘读取）"""
+        return self.records[name]
+
+    def statistics(self, name, chunk=1 << 22):
+        """分块统计一列：{count, mean, min, max}，忽略 NaN，内存占用与文件大小无关"""
+        column = self.column(name)
+        count, total, low, high = 0, 0.0, np.inf, -np.inf
+        for start in range(0, len(column), chunk):
+            values = np.asarray(column[start:start + chunk])
+            values = values[~np.isnan(values)]
+            if len(values):
+                count += len(values)
+                total += float(values.sum())
+                low = min(low, float(values.min()))
+                high = max(high, float(values.max()))
+        if not count:
+            return {"count": 0, "mean": np.nan, "min": np.nan, "max": np.nan}
+        return {"count": count, "mean": total / count, "min": low, "max": high}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="显示录制文件的摘要")
+    parser.add_argument("path", help="录制文件")
+    parser.add_argument("--stats", action="store_true", help="统计各列（需要读取整个文件）")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    recording = Recording(args.path)
+    opened = time.perf_counter() - start
+    print(f"文件: {args.path} ({os.path.getsize(args.path) / 1e6:.1f} MB, 打开用时 {opened * 1000:.2f} ms)")
+    print(f"设备: {recording.identity}")
+    print(f"校准参数: {recording.calibration.items()}")
+    print(f"列: {', '.join(recording.columns)}, 记录数: {len(recording)}")
+    if len(recording):
+        times = recording.column("time")
+        print(f"时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(times[0]))} 起, "
+              f"时长 {times[-1] - times[0]:.1f} s")
+    if args.stats:
+        for name in recording.columns[1:]:
+            print(f"{name}: {recording.statistics(name)}")
+
+
+if __name__ == "__main__":
+    main()
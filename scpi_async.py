@@ -0,0 +1,21 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+import asyncio
+import functools
+import inspect
+
+
+def async_slot(coroutine_function):
+    """把协程函数包装为Qt槽函数，触发时作为任务调度到 QtAsyncio 事件循环
+
+    信号附带的多余参数（如 clicked 的 checked）会被忽略。
+    """
+    parameter_count = len(inspect.signature(coroutine_function).parameters)
+
+    @functools.wraps(coroutine_function)
+    def slot(*args):
+        return asyncio.ensure_future(coroutine_function(*args[:parameter_count]))
+
+    return slot
@@ -0,0 +1,68 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+import re
+import warnings
+
+import numpy as np
+
+# SCPI 数值格式：NR1 整数、NR2 小数、NR3 指数（如 1.2E-3）
+_NUMBER = rb"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+NUMBER_PATTERN = re.compile(_NUMBER)
+TEXT_NUMBER_PATTERN = re.compile(_NUMBER.decode('ascii'))
+
+# SCPI 用 9.91E37 表示 NaN
+SCPI_NAN = 9.91e37
+
+
+def _pattern(data):
+    return TEXT_NUMBER_PATTERN if isinstance(data, str) else NUMBER_PATTERN
+
+
+def _nan(value):
+    return float("nan") if value == SCPI_NAN else value
+
+
+def parse_number(data):
+    """解析单个数值（str、bytes 或 memoryview），不含数值时返回 None
+
+    纯数值响应直接由 float() 解析；带单位或前缀文字时退回预编译正则。
+    """
+    try:
+        return _nan(float(data))
+    except ValueError:
+        pass
+    except TypeError:
+        return None
+    match = _pattern(data).search(data)
+    if match is None:
+        return None
+    return _nan(float(match.group()))
+
+
+def parse_numbers(data):
+    """解析逗号分隔的数值列表，返回 float 列表（无法解析的元素为 None）"""
+    return [parse_number(item) for item in data.split("," if isinstance(data, str) else b",")]
+
+
+def parse_array(data, dtype=np.float64):
+    """向量化解析逗号分隔的数值列表为 NumPy 数组
+
+    整段数据一次交给 NumPy 解析；含非数值元素时退回逐个解析，无法解析的元素为 NaN，
+    数组长度始终与响应的元素个数一致。空行返回空数组。
+    """
+    if not isinstance(data, str):
+        data = str(data, 'ascii', errors='replace')
+    if not data.strip():
+        # fromstring 会把空数据解析为 [-1.]
+        return np.empty(0, dtype=dtype)
+    try:
+        with warnings.catch_warnings():
+            # 旧版本 NumPy 对无法解析的数据只给出警告
+            warnings.simplefilter("error", DeprecationWarning)
+            array = np.fromstring(data, dtype=np.float64, sep=",")
+    except (ValueError, DeprecationWarning):
+        array = np.array([np.nan if value is None else value for value in parse_numbers(data)], dtype=np.float64)
+    array[array == SCPI_NAN] = np.nan
+    return array.astype(dtype, copy=False)
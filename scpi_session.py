@@ -0,0 +1,1107 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+import asyncio
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import serial
+from PySide6.QtCore import QObject, QThread, Signal
+
+from calibration import CalibrationCache
+from scpi_numeric import parse_array, parse_number
+from serial_reader import SerialReader
+
+
+def command_class(command):
+    """命令类别：取命令头部（如 "VOLT?"、"*RCL"），用于按类别统计响应时间"""
+    return command.strip().split(" ", 1)[0].upper()
+
+
+def is_query(command):
+    """是否需要读取响应（查询命令或RCL命令）"""
+    return "?" in command or command.strip().startswith("*RCL")
+
+
+def join_commands(commands):
+    """用 ";" 合并为一行复合命令
+
+    复合命令中 ";" 之后的命令头相对于前一条命令的路径解析，
+    因此非公共命令前加 ":" 回到根路径。
+    """
+    parts = [commands[0].strip()]
+    for command in commands[1:]:
+        command = command.strip()
+        if not command.startswith(("*", ":")):
+            command = ":" + command
+        parts.append(command)
+    return ";".join(parts)
+
+
+def pack_commands(commands, max_line_length):
+    """把命令按顺序分组，每组合并后的长度不超过 max_line_length"""
+    line = []
+    for command in commands:
+        if line and len(join_commands(line + [command])) > max_line_length:
+            yield line
+            line = []
+        line.append(command)
+    if line:
+        yield line
+
+
+# 设备编码探测顺序
+CODECS = ('ascii', 'utf-8', 'gb2312')
+
+
+def detect_codec(raw_response):
+    """探测能够解码原始响应的编码，都失败时返回 gbk（解码时忽略错误）"""
+    for codec in CODECS:
+        try:
+            str(raw_response, codec)
+            return codec
+        except UnicodeDecodeError:
+            pass
+    return 'gbk'
+
+
+def compound_key(commands):
+    """复合命令的响应时间类别；不含查询时返回 None"""
+    keys = [command_class(command) for command in commands if is_query(command)]
+    return ";".join(keys) if keys else None
+
+
+def split_compound(commands, response, log):
+    """把复合命令的合并响应拆分回各条命令的结果"""
+    if response is None:
+        return [None] * len(commands)
+
+    queries = [is_query(command) for command in commands]
+    if not any(queries):
+        return ["OK"] * len(commands)
+
+    parts = [part.strip() for part in response.split(";")]
+    if len(parts) != queries.count(True):
+        log(f"警告：复合响应数量不匹配: {response}")
+        parts = [None] * queries.count(True)
+
+    results = []
+    for query in queries:
+        if not query:
+            results.append("OK")
+            continue
+        part = parts.pop(0)
+        # 检查是否是错误响应
+        if part is not None and (not part or part.startswith("**ERROR")):
+            log("命令不被支持")
+            part = None
+        results.append(part)
+    return results
+
+
+def short_header(command):
+    """命令头的SCPI短格式（如 "SOURce:VOLTage:ULIMit 1" -> "SOUR:VOLT:ULIM"）"""
+    nodes = []
+    for node in command.strip().split(" ", 1)[0].upper().lstrip(":").split(":"):
+        # 短格式取前4个字母，第4个字母为元音时取前3个
+        if len(node) > 4:
+            node = node[:3] if node[3] in "AEIOU" else node[:4]
+        nodes.append(node)
+    return ":".join(nodes)
+
+
+def canonical_header(command):
+    """短格式命令头，省略的默认节点补全为完整形式
+
+    SOURce 根节点、VOLTage/CURRent 的 :DC 和 OUTPut 的 :STATe 都可以省略，
+    如 "VOLT 2"、"SOUR:VOLT 2" -> "SOUR:VOLT:DC"，"OUTP OFF" -> "OUTP:STAT"。
+    """
+    header = short_header(command)
+    if header.startswith(("VOLT", "CURR")):
+        header = "SOUR:" + header
+    if header in ("SOUR:VOLT", "SOUR:CURR"):
+        header += ":DC"
+    elif header == "OUTP":
+        header = "OUTP:STAT"
+    return header
+
+
+# 结果在会话内不变的查询（短格式），结果缓存到 *RST、重连或手动刷新为止
+CACHED_QUERIES = ("*IDN?", "SYST:FIRM?")
+
+# 切换设备串口波特率的命令（SYSTem:COMMunicate:SERial:BAUD）
+BAUD_COMMAND = "SYST:COMM:SER:BAUD"
+
+# 请求优先级（数值越小越先执行）
+PRIORITY_URGENT = 0  # 关输出、*RST：可在其他任务的命令之间插队执行
+PRIORITY_CONTROL = 1  # 限值修改
+PRIORITY_NORMAL = 2
+PRIORITY_POLL = 3  # 例行轮询
+
+# 关闭输出的命令参数
+OFF_ARGUMENTS = ("OFF", "0")
+
+
+def command_priority(command):
+    """按命令内容确定默认优先级"""
+    header = canonical_header(command)
+    parts = command.strip().split(" ", 1)
+    argument = parts[1].strip().upper() if len(parts) > 1 else ""
+    if header == "*RST" or (header == "OUTP:STAT" and argument in OFF_ARGUMENTS):
+        return PRIORITY_URGENT
+    if header.endswith(("ULIM", "LLIM")):
+        return PRIORITY_CONTROL
+    return PRIORITY_NORMAL
+
+
+def format_block_header(length):
+    """IEEE 488.2 定长二进制块头：#<位数><长度>"""
+    digits = str(length)
+    if len(digits) > 9:
+        raise ValueError(f"二进制块过大: {length} 字节")
+    return f"#{len(digits)}{digits}".encode('ascii')
+
+
+def parse_block(data):
+    """从完整的定长二进制块中取出数据部分，返回 memoryview（不复制）"""
+    view = memoryview(data)
+    if len(view) < 2 or view[0] != ord("#"):
+        raise ValueError("不是IEEE 488.2二进制块")
+    digit_count = view[1] - ord("0")
+    if not 1 <= digit_count <= 9:
+        raise ValueError("不支持的二进制块头")
+    start = 2 + digit_count
+    length = int(bytes(view[2:start]))
+    if len(view) < start + length:
+        raise ValueError(f"二进制块不完整: 需要 {length} 字节，实际 {len(view) - start} 字节")
+    return view[start:start + length]
+
+
+def block_to_array(payload, dtype):
+    """把二进制块数据零拷贝解释为 NumPy 数组（dtype 注意字节序，如 ">f4"）"""
+    return np.frombuffer(payload, dtype=dtype)
+
+
+# 断线重连后需要恢复的设置，按恢复顺序排列（先限值，再设定值，最后输出状态）
+RESTORE_HEADERS = (
+    "SOUR:VOLT:ULIM",
+    "SOUR:VOLT:LLIM",
+    "SOUR:CURR:ULIM",
+    "SOUR:CURR:LLIM",
+    "SOUR:VOLT:DC",
+    "SOUR:CURR:DC",
+    "OUTP:STAT",
+)
+
+
+class ResponseTimeouts:
+    """按命令类别自适应的响应超时
+
+    每类命令维护平滑响应时间和平均偏差（与TCP RTO估计相同），
+    超时取 平滑值 + 4 * 偏差，并限制在 [lower, upper] 之间；upper 为硬上限。
+    lower 要高于USB转串口适配器的延迟（FTDI 延迟定时器默认 16 ms）和正常抖动，
+    否则偶尔稍慢的响应会变成失败的查询。
+    超时后该类命令的超时加倍（退避），直到下一次成功响应。
+    """
+
+    # 退避倍数上限
+    max_backoff = 64
+
+    def __init__(self, upper=0.5, lower=0.1):
+        self.upper = upper
+        self.lower = lower
+        self._stats = {}  # 类别 -> [平滑响应时间, 平均偏差, 退避倍数]
+
+    def reset(self):
+        self._stats.clear()
+
+    def timeout(self, key):
+        """该类命令当前的读超时（秒），没有统计时返回硬上限"""
+        stats = self._stats.get(key)
+        if stats is None:
+            return self.upper
+        srtt, rttvar, backoff = stats
+        return min(self.upper, max(self.lower, srtt + 4 * rttvar) * backoff)
+
+    def observe(self, key, elapsed):
+        """记录一次成功响应的耗时，结束退避"""
+        stats = self._stats.get(key)
+        if stats is None:
+            self._stats[key] = [elapsed, elapsed / 2, 1]
+        else:
+            srtt, rttvar, _ = stats
+            stats[1] = 0.75 * rttvar + 0.25 * abs(srtt - elapsed)
+            stats[0] = 0.875 * srtt + 0.125 * elapsed
+            stats[2] = 1
+
+    def expire(self, key):
+        """响应超时：该类命令的超时加倍"""
+        stats = self._stats.get(key)
+        if stats is not None:
+            stats[2] = min(self.max_backoff, stats[2] * 2)
+
+
+class ScpiTransport:
+    """串口SCPI传输层（阻塞调用，只能在会话工作线程中使用）"""
+
+    # 复合命令单行最大长度（不含终止符）
+    max_line_length = 128
+
+    # 断线自动重连：尝试次数、首次退避间隔和最大退避间隔（秒）
+    reconnect_attempts = 8
+    reconnect_delay = 0.2
+    max_reconnect_delay = 5.0
+
+    # 波特率协商时依次尝试的速率（从高到低），以及设备切换速率所需的时间（秒）
+    negotiate_baudrates = (921600, 460800, 230400)
+    baud_switch_delay = 0.01
+
+    def __init__(self, log=None, auto_reconnect=True):
+        self.ser = None
+        self.reader = None
+        # 非请求数据（没有等待中的查询时收到的行）的回调，在读取线程中调用，
+        # 参数 memoryview 只在回调期间有效
+        self.on_unsolicited = None
+        self.port = None
+        self.baudrate = 115200
+        self.base_baudrate = 115200  # 打开串口时的波特率（设备上电默认值）
+        self.timeout = 0.5
+        self.log = log or (lambda message: None)
+        self.timeouts = ResponseTimeouts()
+        self.auto_reconnect = auto_reconnect
+        self.state = {}  # 短格式命令头 -> 最近一次设置命令，用于断线恢复
+        self.codec = None  # *IDN? 时探测到的设备编码
+        self.cache = {}  # 短格式查询 -> 缓存的响应
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.calibration = CalibrationCache()  # *RCL 读缓存，*SAV 写穿
+        self._reconnecting = False
+        # 热插拔监视发现设备重新插入时设置，唤醒退避等待中的重连
+        self._replugged = threading.Event()
+        self._replug_port = None
+        # 每行命令发送前调用，会话用它在长任务的命令之间插入紧急请求
+        self.preempt = None
+
+    @property
+    def is_open(self):
+        """逻辑上是否已连接（断线重连期间仍为 True）"""
+        return self.port is not None
+
+    @property
+    def online(self):
+        """串口当前是否可用"""
+        return self.ser is not None
+
+    def open(self, port, baudrate=115200, timeout=0.5):
+        """打开串口，timeout 同时作为响应读超时的硬上限"""
+        self.close()
+        self.port = port
+        self.baudrate = baudrate
+        self.base_baudrate = baudrate
+        self.timeout = timeout
+        self._open_serial()
+
+        # 新连接重新统计响应时间、重新探测编码
+        self.timeouts.upper = timeout
+        self.timeouts.reset()
+        self.state.clear()
+        self.codec = None
+        self.invalidate_cache()
+        self.calibration.invalidate()
+
+    def _open_serial(self):
+        self.ser = serial.Serial(
+            port=self.port,
+            baudrate=self.baudrate,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            timeout=self.timeout,
+            write_timeout=self.timeout,
+            xonxoff=False,
+            rtscts=False,
+            dsrdtr=False
+        )
+
+        # 清空缓冲区
+        self.ser.reset_input_buffer()
+        self.ser.reset_output_buffer()
+
+        # 后台读取线程负责所有接收
+        self.reader = SerialReader(self.ser, on_unsolicited=self._unsolicited)
+
+    def _unsolicited(self, line):
+        if self.on_unsolicited is not None:
+            self.on_unsolicited(line)
+
+    def connect(self, port, baudrate=115200, timeout=0.5, negotiate=False):
+        """打开串口并初始化设备，返回设备标识
+
+        设备未应答就绪探测时视为连接失败：不发送初始化命令（避免复位无关的串口设备），
+        关闭串口并返回 None。negotiate 为 True 时初始化后尝试协商更高的波特率。
+        """
+        self.open(port, baudrate, timeout)
+
+        # 等待设备就绪，同时获取设备标识
+        identity = self.wait_ready()
+        if not identity:
+            self.log(f"错误：{port} 上的设备无响应")
+            self.close()
+            return None
+        self.log(f"已连接到设备: {port}")
+
+        # 发送初始化命令序列（合并为一条复合命令）
+        init_commands = [
+            "*CLS",  # 清除状态寄存器
+            "*RST",  # 重置设备
+            "SYST:REM",  # 切换到远程控制模式
+        ]
+        self.send_batch(init_commands)
+        self.cache["*IDN?"] = identity
+
+        if negotiate:
+            self.negotiate_baudrate()
+        return identity
+
+    def set_baudrate(self, baudrate):
+        """修改本地串口波特率（不重新打开串口）"""
+        self.ser.baudrate = baudrate
+        self.baudrate = baudrate
+
+    def negotiate_baudrate(self, rates=None):
+        """依次尝试更高的波特率，新速率下就绪探测失败时回退，返回最终波特率
+
+        设备收到切换命令后改用新速率；若新速率下链路不可用，设备应在超时后回到原速率。
+        """
+        original = self.baudrate
+        for rate in rates or self.negotiate_baudrates:
+            if rate <= original:
+                continue
+            command = f"{BAUD_COMMAND} {rate}"
+            if self.send(command) is None:
+                break
+            # flush 返回时数据可能还在USB转串口芯片中：等待按原速率发送完毕、设备完成切换
+            time.sleep((len(command) + 2) * 10 / original + self.baud_switch_delay)
+            self.set_baudrate(rate)
+            if self.wait_ready(deadline=self.timeout):
+                self.log(f"波特率已切换到 {rate}")
+                self.timeouts.reset()
+                return rate
+
+            self.log(f"波特率 {rate} 无响应，回退到 {original}")
+            self.set_baudrate(original)
+            if not self.wait_ready(deadline=self.timeout * 4):
+                self.log("警告：回退后设备无响应")
+                break
+        return self.baudrate
+
+    def wait_ready(self, deadline=2.0, attempt_timeout=0.1):
+        """就绪探测：短超时重复发送 *IDN?，设备一应答立即返回标识
+
+        各次探测的响应相同，迟到的响应可以作为后一次探测的应答；就绪后丢弃
+        其余探测的迟到响应。记录从打开串口到就绪的耗时；deadline 内无应答或串口
+        已失效（写入出错后被关闭且没有重连）时返回空字符串。
+        """
+        start = time.perf_counter()
+        missed = 0
+        while True:
+            identity = self._transact("*IDN?", command_class("*IDN?"), timeout=attempt_timeout,
+                                      parse=self._identify)
+            elapsed = time.perf_counter() - start
+            if identity:
+                self.log(f"设备就绪用时: {elapsed * 1000:.1f} ms")
+                self._discard_late(missed, attempt_timeout * 2)
+                return identity
+            missed += 1
+            if self.ser is None:
+                # 串口已关闭，之后的探测都会立即失败
+                self.log("警告：串口不可用，停止就绪探测")
+                return ""
+            if elapsed >= deadline:
+                self.log("警告：设备未响应就绪探测")
+                return ""
+
+    def _discard_late(self, count, quiet):
+        """丢弃最多 count 条迟到的响应，quiet 秒内没有新响应时结束"""
+        for _ in range(count):
+            if self.reader is None or self.reader.wait(self.reader.expect(), quiet) is None:
+                break
+
+    def close(self):
+        """关闭串口"""
+        self._drop()
+        self.port = None
+        self._replug_port = None
+
+    def _drop(self):
+        """关闭失效的串口对象，保留端口以便重连"""
+        if self.reader:
+            self.reader.stop()
+            self.reader = None
+        if self.ser:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+            finally:
+                self.ser = None
+
+    def reconnect(self):
+        """断线后按指数退避重新打开串口，并恢复之前的设置（不发送 *RST）"""
+        if self.port is None:
+            return False
+
+        self._reconnecting = True
+        delay = self.reconnect_delay
+        try:
+            for attempt in range(1, self.reconnect_attempts + 1):
+                self._replugged.clear()
+                if self._replug_port is not None:
+                    self.port, self._replug_port = self._replug_port, None
+                self.log(f"正在重连 {self.port} (第{attempt}次)...")
+                try:
+                    self._open_serial()
+                    if self.wait_ready(deadline=self.timeout) or self._fall_back_baudrate():
+                        # 可能已换了设备或固件
+                        self.invalidate_cache()
+                        self.calibration.invalidate()
+                        self.restore_state()
+                        return True
+                except Exception:
+                    pass
+                self._drop()
+                self._replugged.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+        finally:
+            self._reconnecting = False
+
+        self.log(f"重连失败: {self.port}")
+        return False
+
+    def unplugged(self):
+        """设备已拔出：关闭失效的串口，保留端口等待重新插入"""
+        if self.port is not None and self.ser is not None:
+            self.log(f"设备已拔出: {self.port}")
+            self._drop()
+
+    def replugged(self, port):
+        """设备重新插入（可在任意线程调用）：记录新的端口名，立即唤醒退避等待中的重连"""
+        self._replug_port = port
+        self._replugged.set()
+
+    def _fall_back_baudrate(self):
+        """协商过的速率下无响应（设备可能已重新上电）：用初始速率探测并重新协商"""
+        negotiated = self.baudrate
+        if negotiated == self.base_baudrate:
+            return False
+        self.set_baudrate(self.base_baudrate)
+        if not self.wait_ready(deadline=self.timeout):
+            self.set_baudrate(negotiated)
+            return False
+        self.negotiate_baudrate([negotiated])
+        return True
+
+    def restore_state(self):
+        """重新发送记录的限值、设定值和输出状态"""
+        commands = [self.state[header] for header in RESTORE_HEADERS if header in self.state]
+        if commands:
+            self.send_batch(commands)
+        self.log(f"已重新连接，恢复 {len(commands)} 项设置")
+
+    def _remember(self, command):
+        """记录设置命令（同一设置的不同写法记为同一项）；*RST 后设备回到默认状态，清空记录"""
+        header = canonical_header(command)
+        if header == "*RST":
+            self.state.clear()
+            self.invalidate_cache()
+        elif header in RESTORE_HEADERS:
+            self.state[header] = command
+
+    def invalidate_cache(self):
+        """清空查询缓存，之后的查询重新从设备读取"""
+        self.cache.clear()
+
+    def cache_stats(self):
+        """缓存命中/未命中次数"""
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "entries": len(self.cache)}
+
+    def _cache_key(self, command):
+        """查询缓存的键（短格式），不可缓存的命令返回 None"""
+        if not command.endswith("?"):
+            return None
+        key = short_header(command.rstrip("?")) + "?"
+        return key if key in CACHED_QUERIES else None
+
+    def _cached(self, command):
+        """命中查询缓存或校准参数缓存时返回缓存的响应，否则返回 None"""
+        key = self._cache_key(command)
+        if key is None:
+            response = self.calibration.lookup(command)
+        elif key in self.cache:
+            self.cache_hits += 1
+            response = self.cache[key]
+        else:
+            self.cache_misses += 1
+            response = None
+        if response is not None:
+            self.log(f"收到响应(缓存): {response}")
+        return response
+
+    def _store(self, command, response):
+        """把成功的响应写入对应的缓存"""
+        key = self._cache_key(command)
+        if key is not None:
+            self.cache[key] = response
+        else:
+            self.calibration.update(command, response)
+
+    def _identify(self, line):
+        """*IDN? 响应：探测并记住设备编码（在读取线程中调用）"""
+        self.codec = detect_codec(line)
+        return str(line, self.codec, errors='ignore').strip()
+
+    def _decode(self, line):
+        """按记住的编码一次解码（在读取线程中调用）；尚未探测或解码失败时重新探测"""
+        if self.codec is not None:
+            try:
+                return str(line, self.codec).strip()
+            except UnicodeDecodeError:
+                pass
+        return self._identify(line)
+
+    def _parse_float(self, line):
+        """数值响应快速路径：直接从接收缓冲区解析浮点数，不含数值时解码为文本"""
+        value = parse_number(line)
+        if value is None:
+            return self._decode(line)
+        return value
+
+    def _parse_floats(self, line):
+        """复合数值响应（如 "1.2345;0.5"）：逐项直接解析为 float，无法解析的项为 None"""
+        return [parse_number(item) for item in bytes(line).split(b";")]
+
+    def _parse_array(self, line):
+        """逗号分隔的数值列表：整行向量化解析为 NumPy 数组，出错响应解码为文本"""
+        if line[:1] == b"*":
+            return self._decode(line)
+        return parse_array(line)
+
+    def read_response(self, key, request, timeout=None):
+        """等待读取线程交付响应：收到终止符 \n（或完整的二进制块）立即返回
+
+        超时默认按命令类别 key 自适应，超时后的硬上限时间内到达的迟到响应被丢弃，
+        不会错配给下一条查询；指定 timeout 时（就绪探测）使用固定超时，超时不计入统计，
+        也不等待迟到响应。二进制块在持续收到数据期间不会超时。
+        """
+        start = time.perf_counter()
+        if timeout is None:
+            response = self.reader.wait(request, self.timeouts.timeout(key), grace=self.timeouts.upper)
+        else:
+            response = self.reader.wait(request, timeout)
+        if response is not None:
+            if not request.binary:
+                self.timeouts.observe(key, time.perf_counter() - start)
+        elif timeout is None:
+            self.timeouts.expire(key)
+        return response
+
+    def _transact(self, line, key=None, timeout=None, binary=False, block=None, parse=None, quiet=False):
+        """写入一行命令；key 不为 None 时读取一行响应
+
+        返回响应文本（非查询返回 "OK"），出错或无响应返回 None。
+        parse(line) 在读取线程中把响应行的 memoryview 转为结果，默认按设备编码解码。
+        binary 为 True 时响应按二进制块读取并返回 bytearray；
+        block 不为 None 时把它作为定长二进制块参数附加在命令之后。
+        quiet 为 True 时不记录每次的发送和响应（高频轮询用），错误仍然记录。
+        串口I/O出错时自动重连，成功后重发一次。
+        """
+        if self.preempt is not None and not self._reconnecting:
+            self.preempt()
+        if self.ser is None and self.port is not None and self.auto_reconnect and not self._reconnecting:
+            self.reconnect()
+        if not self.ser:
+            self.log("错误：未连接到设备")
+            return None
+
+        try:
+            # 编码错误不属于串口故障
+            if block is None:
+                data = (line + "\r\n").encode('ascii')  # 使用 \r\n 作为终止符
+            else:
+                data = b"".join([line.encode('ascii'), b" ", format_block_header(len(block)),
+                                 block, b"\r\n"])
+                line = f"{line} #<{len(block)} 字节>"
+        except (UnicodeEncodeError, ValueError) as e:
+            self.log(f"命令发送错误: {str(e)}")
+            return None
+
+        try:
+            response = self._exchange(line, data, key, timeout, binary, parse, quiet)
+        except ValueError as e:
+            # 二进制块格式错误，不属于串口故障
+            self.log(f"读取响应错误: {str(e)}")
+            return None
+        except Exception as e:
+            self._drop()
+            if self._reconnecting:
+                raise
+            self.log(f"连接中断: {str(e)}")
+            if not self.auto_reconnect or not self.reconnect():
+                return None
+            try:
+                response = self._exchange(line, data, key, timeout, binary, parse, quiet)
+            except Exception as e:
+                self._drop()
+                self.log(f"命令发送错误: {str(e)}")
+                return None
+
+        if key is None:
+            return "OK"  # 非查询命令返回OK
+        if binary and response is not None:
+            self.log(f"收到二进制块: {len(response)} 字节")
+            return response
+
+        if response is None or (isinstance(response, str) and not response):
+            self.log("警告：未收到响应")
+            return None
+        if quiet:
+            pass
+        elif isinstance(response, np.ndarray):
+            self.log(f"收到数值列表: {len(response)} 个")
+        else:
+            self.log(f"收到响应: {response}")
+        return response
+
+    def _exchange(self, line, data, key, timeout, binary=False, parse=None, quiet=False):
+        """串口I/O：写入命令并按需等待响应（文本已解码，二进制块为 bytearray），I/O异常直接抛出"""
+        # 读取线程发现的串口故障
+        if self.reader.error is not None:
+            raise self.reader.error
+
+        # 在写入之前登记请求，避免响应先于登记到达
+        request = None
+        if key is not None:
+            request = self.reader.expect(parse or self._decode, binary)
+
+        # 添加调试信息
+        if not quiet:
+            self.log(f"发送命令: {line}")
+
+        # 发送命令
+        self.ser.write(data)
+        self.ser.flush()
+
+        if request is None:
+            return None
+        return self.read_response(key, request, timeout)
+
+    def send(self, command):
+        """发送SCPI命令并获取响应
+
+        CACHED_QUERIES 中的查询和 *RCL 优先使用缓存，*SAV 成功后更新校准参数缓存。
+        """
+        command = command.strip()
+        cached = self._cached(command)
+        if cached is not None:
+            return cached
+        return self._send_uncached(command)
+
+    def _send_uncached(self, command):
+        """不经过缓存发送命令（send 的设备访问部分）"""
+        # 如果是查询命令或RCL命令，等待响应
+        key = command_class(command) if is_query(command) else None
+        response = self._transact(command, key)
+        # 检查是否是错误响应
+        if response is not None and response.startswith("**ERROR"):
+            self.log("命令不被支持")
+            return None
+        if response is not None:
+            if key is None:
+                self._remember(command)
+            self._store(command, response)
+        return response
+
+    def query_float(self, command):
+        """数值查询：响应在读取线程中直接解析为 float，不是数值时返回 None"""
+        command = command.strip()
+        cached = self._cached(command)
+        if cached is not None:
+            return parse_number(cached)
+
+        response = self._transact(command, command_class(command), parse=self._parse_float)
+        if isinstance(response, str):
+            if response.startswith("**ERROR"):
+                self.log("命令不被支持")
+            else:
+                self.log(f"无法解析数值响应: {response}")
+            return None
+        if response is not None:
+            self._store(command, str(response))
+        return response
+
+    def query_floats(self, commands, quiet=False):
+        """多条数值查询合并为一行发送（如 VOLT?;CURR?），返回 float 列表（无法解析的项为 None）
+
+        只需一次串口往返；出错或无响应返回 None。quiet 为 True 时不记录每次的收发。
+        """
+        commands = [command.strip() for command in commands]
+        response = self._transact(join_commands(commands), compound_key(commands),
+                                  parse=self._parse_floats, quiet=quiet)
+        if not isinstance(response, list):
+            return None
+        if len(response) != len(commands):
+            self.log(f"复合查询响应个数不符: 期望 {len(commands)} 个, 收到 {len(response)} 个")
+            return None
+        return response
+
+    def query_array(self, command):
+        """数值列表查询（如 "MEAS:VOLT? (@1:8)"）：返回 NumPy 数组，出错返回 None"""
+        command = command.strip()
+        response = self._transact(command, command_class(command), parse=self._parse_array)
+        if isinstance(response, str):
+            self.log("命令不被支持")
+            return None
+        return response
+
+    def query_block(self, command, dtype=None):
+        """查询返回 IEEE 488.2 二进制块的命令
+
+        dtype 为 None 时返回数据的 memoryview，否则零拷贝转为 NumPy 数组
+        （注意字节序，如 ">f4"）；出错返回 None。
+        """
+        command = command.strip()
+        payload = self._transact(command, command_class(command), binary=True)
+        if payload is None:
+            return None
+        if dtype is None:
+            return memoryview(payload)
+        return block_to_array(payload, dtype)
+
+    def send_block(self, command, data):
+        """发送带定长二进制块参数的命令，如 send_block("CAL:TABL", array)"""
+        return self._transact(command.strip(), block=memoryview(data).cast("B"))
+
+    def send_batch(self, commands):
+        """批量发送命令：用 ";" 合并为尽量少的行，每行一次写入
+
+        返回与 commands 一一对应的结果列表，语义与 send() 相同。批次中第一条设置命令之前的
+        查询与 send() 一样优先使用缓存（如已缓存的 *RCL n），只发送其余的命令；
+        设置命令之后的查询总是发送，避免读到同一批次中 *SAV 之前的旧值。
+        """
+        results = [None] * len(commands)
+        pending = []  # (位置, 命令)
+        writes = False
+        for index, command in enumerate(commands):
+            command = command.strip()
+            writes = writes or not is_query(command)
+            cached = None if writes else self._cached(command)
+            if cached is None:
+                pending.append((index, command))
+            else:
+                results[index] = cached
+
+        position = 0
+        for line_commands in pack_commands([command for _, command in pending], self.max_line_length):
+            if len(line_commands) == 1:
+                line_results = [self._send_uncached(line_commands[0])]
+            else:
+                line_results = self._send_compound(line_commands)
+            for result in line_results:
+                results[pending[position][0]] = result
+                position += 1
+        return results
+
+    def _send_compound(self, commands):
+        """发送一行复合命令，并把合并的响应拆分回各条命令"""
+        response = self._transact(join_commands(commands), compound_key(commands))
+        results = split_compound(commands, response, self.log)
+        for command, result in zip(commands, results):
+            if result is not None:
+                if not is_query(command):
+                    self._remember(command)
+                self._store(command, result)
+        return results
+
+
+def chain_future(source):
+    """创建跟随 source 完成的 Future；取消它不影响 source"""
+    future = Future()
+
+    def copy(source):
+        if source.cancelled():
+            future.cancel()
+            return
+        if not future.set_running_or_notify_cancel():
+            return
+        future.queue_wait = getattr(source, "queue_wait", None)
+        error = source.exception()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(source.result())
+
+    source.add_done_callback(copy)
+    return future
+
+
+# 可合并的查询类型 -> 传输层查询方法
+QUERY_KINDS = {
+    "text": lambda transport, command: transport.send(command),
+    "float": lambda transport, command: transport.query_float(command),
+    "array": lambda transport, command: transport.query_array(command),
+}
+
+
+class _QueuedRequest:
+    """排队中的会话请求"""
+
+    def __init__(self, job, future, callback, error_prefix, priority, deadline):
+        self.job = job
+        self.future = future
+        # 请求完成后在GUI线程中通知的 (回调, 错误前缀, Future)，合并查询时有多个
+        self.callbacks = [(callback, error_prefix, future)]
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.started = None
+        self.deadline = None if deadline is None else self.enqueued + deadline
+        self.query_key = None
+
+
+class _SessionWorker(QThread):
+    """会话工作线程：按优先级执行请求队列中的任务"""
+
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+
+    def run(self):
+        while True:
+            _, _, request = self.session._requests.get()
+            if request is None:
+                break
+            self.execute(request)
+
+    def execute(self, request):
+        self.session._dequeued(request)
+        future = request.future
+        if not future.set_running_or_notify_cancel():
+            return
+        # 记录排队等待时间
+        started = request.started = time.monotonic()
+        future.queue_wait = started - request.enqueued
+        self.session._record_wait(request.priority, future.queue_wait)
+        # 紧急请求之间不互相插队，保持先进先出
+        preempting = self.session._preempting
+        if request.priority <= PRIORITY_URGENT:
+            self.session._preempting = True
+        try:
+            if request.deadline is not None and started > request.deadline:
+                raise TimeoutError(f"排队超时: 等待 {future.queue_wait * 1000:.1f} ms")
+            result = request.job(self.session.transport)
+        except Exception as e:
+            self.session._query_done(request)
+            future.set_exception(e)
+        else:
+            self.session._query_done(request)
+            future.set_result(result)
+        finally:
+            self.session._preempting = preempting
+        self.session._finished.emit(request)
+
+
+class ScpiSession(QObject):
+    """SCPI会话：持有串口，并在独立的工作线程中串行执行所有I/O
+
+    GUI线程只通过 submit()/command() 提交任务，结果通过 Future 返回，
+    回调函数经由信号在GUI线程中执行。请求按优先级出队，同优先级先进先出；
+    紧急请求（关输出、*RST）还会在正在执行的任务的两行命令之间插队执行。
+    query()/read() 提交的相同查询在排队或刚开始执行期间会合并为一次串口往返。
+    """
+
+    # 已开始执行的查询在多长时间内（秒）仍可合并新的调用者
+    coalesce_window = 0.05
+
+    message = Signal(str)
+    _finished = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.transport = ScpiTransport(log=self.message.emit)
+        self.transport.preempt = self._run_urgent
+        self._requests = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._urgent_pending = 0  # 队列中的紧急请求数
+        self._urgent_lock = threading.Lock()
+        self._preempting = False
+        self.queue_waits = {}  # 优先级 -> [次数, 总等待时间, 最大等待时间]
+        self._queries = {}  # (类型, 命令) -> 进行中的查询请求
+        self._query_lock = threading.Lock()
+        self.queries_sent = 0  # 实际发出的查询数
+        self.queries_coalesced = 0  # 合并到已有查询的调用数
+        self._finished.connect(self._dispatch)
+        self._worker = _SessionWorker(self)
+        self._worker.start()
+
+    @property
+    def is_open(self):
+        return self.transport.is_open
+
+    def submit(self, job, callback=None, error_prefix="命令执行错误",
+               priority=PRIORITY_NORMAL, deadline=None):
+        """提交任务 job(transport)，返回 Future；callback(result) 在GUI线程中执行
+
+        error_prefix 为 None 时不输出错误信息，由调用方处理 Future 中的异常。
+        deadline 为最长排队时间（秒），超过时不再执行，Future 以 TimeoutError 结束。
+        任务开始执行后 Future.queue_wait 为排队等待时间（秒）。
+        """
+        return self._enqueue(job, callback, error_prefix, priority, deadline).future
+
+    def _enqueue(self, job, callback, error_prefix, priority, deadline=None):
+        return self._put(_QueuedRequest(job, Future(), callback, error_prefix, priority, deadline))
+
+    def _put(self, request):
+        """把请求放入队列；之后工作线程随时可能执行并完成它"""
+        if request.priority <= PRIORITY_URGENT:
+            with self._urgent_lock:
+                self._urgent_pending += 1
+        self._requests.put((request.priority, next(self._sequence), request))
+        return request
+
+    def query(self, command, callback=None, error_prefix="查询错误", kind="text", priority=PRIORITY_NORMAL):
+        """提交可合并的查询，返回 Future；kind 为 "text"、"float" 或 "array"
+
+        同一查询已在排队（且优先级不低于本次），或开始执行不到 coalesce_window 秒时，
+        不再发送，直接共享它的结果。
+        """
+        command = command.strip()
+        key = (kind, command.upper())
+        now = time.monotonic()
+        with self._query_lock:
+            request = self._queries.get(key)
+            if request is not None and (
+                    request.started is None and request.priority <= priority
+                    or request.started is not None and now - request.started <= self.coalesce_window):
+                future = chain_future(request.future)
+                request.callbacks.append((callback, error_prefix, future))
+                self.queries_coalesced += 1
+                return future
+
+            # 先登记到合并表再入队，工作线程完成请求时总能找到并移除它
+            query = QUERY_KINDS[kind]
+            request = _QueuedRequest(lambda transport: query(transport, command), Future(), None, None,
+                                     priority, None)
+            future = chain_future(request.future)
+            request.callbacks = [(callback, error_prefix, future)]
+            request.query_key = key
+            self._queries[key] = request
+            self.queries_sent += 1
+            self._put(request)
+            return future
+
+    async def read(self, command, kind="text", priority=PRIORITY_NORMAL):
+        """在协程中读取可合并的查询"""
+        return await asyncio.wrap_future(self.query(command, None, None, kind, priority))
+
+    def command(self, command, callback=None, error_prefix="命令发送错误", priority=None, deadline=None):
+        """提交单条SCPI命令，priority 为 None 时按命令内容确定优先级"""
+        if priority is None:
+            priority = command_priority(command)
+        return self.submit(lambda transport: transport.send(command), callback, error_prefix,
+                           priority, deadline)
+
+    async def run(self, job, priority=PRIORITY_NORMAL, deadline=None):
+        """在协程中提交任务 job(transport) 并等待结果"""
+        return await asyncio.wrap_future(self.submit(job, None, None, priority, deadline))
+
+    async def send(self, command, priority=None, deadline=None):
+        """在协程中发送单条SCPI命令并等待响应"""
+        if priority is None:
+            priority = command_priority(command)
+        return await self.run(lambda transport: transport.send(command), priority, deadline)
+
+    def batch(self, commands, callback=None, error_prefix="命令发送错误", priority=None, deadline=None):
+        """提交一组命令，合并为尽量少的复合命令行发送；优先级取其中最高的"""
+        commands = list(commands)
+        if priority is None:
+            priority = min((command_priority(command) for command in commands), default=PRIORITY_NORMAL)
+        return self.submit(lambda transport: transport.send_batch(commands), callback, error_prefix,
+                           priority, deadline)
+
+    def unplugged(self):
+        """当前设备已拔出：关闭失效的串口，保持逻辑连接等待重新插入"""
+        return self.submit(lambda transport: transport.unplugged(), None, "连接错误", PRIORITY_CONTROL)
+
+    def replugged(self, port, callback=None):
+        """当前设备重新插入（端口名可能改变）：唤醒进行中的重连，空闲时立即重连
+
+        callback(是否已连接) 在GUI线程中执行。
+        """
+        self.transport.replugged(port)
+        return self.submit(lambda transport: transport.online or transport.reconnect(), callback,
+                           "重连错误", PRIORITY_CONTROL)
+
+    def wait_stats(self):
+        """各优先级的排队等待统计：{优先级: (次数, 平均等待, 最大等待)}（秒）"""
+        return {priority: (count, total / count, longest)
+                for priority, (count, total, longest) in sorted(self.queue_waits.items())}
+
+    def shutdown(self):
+        """停止工作线程并关闭串口（已排队的任务执行完后停止）"""
+        self._requests.put((float("inf"), next(self._sequence), None))
+        self._worker.wait()
+        self.transport.close()
+
+    def _query_done(self, request):
+        """查询完成前移出合并表，之后的调用重新发送"""
+        if request.query_key is None:
+            return
+        with self._query_lock:
+            if self._queries.get(request.query_key) is request:
+                del self._queries[request.query_key]
+
+    def _dequeued(self, request):
+        if request.priority <= PRIORITY_URGENT:
+            with self._urgent_lock:
+                self._urgent_pending -= 1
+
+    def _record_wait(self, priority, wait):
+        stats = self.queue_waits.setdefault(priority, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += wait
+        stats[2] = max(stats[2], wait)
+
+    def _run_urgent(self):
+        """在工作线程中、当前任务的两行命令之间执行排队中的紧急请求"""
+        if self._urgent_pending <= 0 or self._preempting:
+            return
+        self._preempting = True
+        try:
+            while True:
+                try:
+                    entry = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if entry[0] > PRIORITY_URGENT:
+                    # 队首已不是紧急请求：放回（序号不变，顺序不受影响）
+                    self._requests.put(entry)
+                    break
+                self.message.emit("插队执行紧急命令")
+                self._worker.execute(entry[2])
+        finally:
+            self._preempting = False
+
+    def _dispatch(self, request):
+        for callback, error_prefix, future in request.callbacks:
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is not None:
+                if error_prefix is not None:
+                    self.message.emit(f"{error_prefix}: {str(error)}")
+            elif callback is not None:
+                callback(future.result())
@@ -0,0 +1,331 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+import threading
+import time
+
+
+class RingBuffer:
+    """定长环形字节缓冲区（预分配 bytearray + memoryview）
+
+    写入直接进入空闲区，按行取出时返回指向缓冲区内部的 memoryview，
+    只有跨越缓冲区末尾的行才会拷贝到预分配的暂存区，运行期间不随数据量增长。
+    """
+
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._scratch = bytearray(capacity)
+        self._scratch_view = memoryview(self._scratch)
+        self._start = 0  # 读位置（绝对计数）
+        self._end = 0  # 写位置（绝对计数）
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        self._start = self._end
+
+    def writable(self):
+        """当前可连续写入的空闲区 memoryview"""
+        offset = self._end % self.capacity
+        free = self.capacity - len(self)
+        return self._view[offset:offset + min(free, self.capacity - offset)]
+
+    def commit(self, count):
+        """确认写入了 count 字节"""
+        self._end += count
+
+    def write(self, data):
+        """写入数据，空间不足时返回实际写入的字节数"""
+        data = memoryview(data).cast("B")
+        written = 0
+        while written < len(data):
+            target = self.writable()
+            if not target:
+                break
+            count = min(len(target), len(data) - written)
+            target[:count] = data[written:written + count]
+            self.commit(count)
+            written += count
+        return written
+
+    def find(self, byte):
+        """查找字节在可读数据中的位置（相对读位置），不存在返回 -1"""
+        offset = self._start % self.capacity
+        size = len(self)
+        first = min(size, self.capacity - offset)
+        index = self._buffer.find(byte, offset, offset + first)
+        if index >= 0:
+            return index - offset
+        if size > first:
+            index = self._buffer.find(byte, 0, size - first)
+            if index >= 0:
+                return first + index
+        return -1
+
+    def peek(self, count):
+        """取出前 count 字节的 memoryview（不移动读位置），跨越末尾时使用暂存区"""
+        offset = self._start % self.capacity
+        if offset + count <= self.capacity:
+            return self._view[offset:offset + count]
+        first = self.capacity - offset
+        self._scratch_view[:first] = self._view[offset:]
+        self._scratch_view[first:count] = self._view[:count - first]
+        return self._scratch_view[:count]
+
+    def segments(self, count):
+        """前 count 字节对应的一到两个连续 memoryview 段（不拷贝）"""
+        offset = self._start % self.capacity
+        first = min(count, self.capacity - offset)
+        if first == count:
+            return (self._view[offset:offset + count],)
+        return self._view[offset:], self._view[:count - first]
+
+    def consume(self, count):
+        self._start += min(count, len(self))
+
+
+class _Request:
+    """等待中的响应：一行文本或一个二进制块"""
+
+    def __init__(self, parse, binary):
+        self.parse = parse
+        self.binary = binary
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # 已超时但仍等待迟到响应的截止时间（time.monotonic），迟到的响应被丢弃
+        self.deadline = None
+        # 二进制块的接收状态
+        self.payload = None
+        self.received = 0
+        # 超过环形缓冲区容量的响应行，已接收的部分
+        self.overflow = None
+
+
+class SerialReader:
+    """后台串口读取线程
+
+    把 in_waiting 报告的数据批量读入环形缓冲区，在缓冲区内按行切分：
+    有等待中的请求时把行（或二进制块）交给请求，否则交给 on_unsolicited 回调，
+    回调收到的 memoryview 只在回调期间有效。
+    超过缓冲区容量的响应行移入请求自己的缓冲区继续接收（最长 max_line_length），
+    超长时请求以错误结束；没有请求的超长数据丢弃到下一个终止符。
+    """
+
+    # 读取线程单次阻塞等待时间（秒），决定停止时的响应速度
+    poll_interval = 0.05
+    # 单行响应的最大长度（字节）
+    max_line_length = 1 << 24
+
+    def __init__(self, ser, capacity=65536, on_unsolicited=None):
+        self.ser = ser
+        self.ring = RingBuffer(capacity)
+        self.on_unsolicited = on_unsolicited
+        self.error = None
+        self.overflows = 0
+        self.late_responses = 0  # 丢弃的迟到响应数
+        self._request = None
+        self._skip_terminator = False
+        self._skip_line = False  # 正在丢弃一行超长数据的其余部分
+        self._lock = threading.Lock()
+        self._running = True
+        self.ser.timeout = self.poll_interval
+        self._thread = threading.Thread(target=self._run, name=f"SerialReader-{ser.port}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if threading.current_thread() is not self._thread:
+            self._thread.join(self.poll_interval * 4)
+
+    def expect(self, parse=bytes, binary=False):
+        """登记下一条响应的请求（必须在写命令之前调用）
+
+        上一个请求超时后仍在等待迟到响应时，先等它到达（并丢弃）或过了截止时间，
+        否则迟到的响应会被当作这个请求的响应，之后的响应全部错位。
+        同时丢弃缓冲区中残留的不完整数据（完整的行已经分发过）。
+        parse(view) 在读取线程中把行的 memoryview 转为结果。
+        """
+        with self._lock:
+            stale = self._request
+        if stale is not None and stale.deadline is not None:
+            stale.done.wait(max(0.0, stale.deadline - time.monotonic()))
+        with self._lock:
+            self.ring.clear()
+            self._skip_terminator = False
+            self._request = _Request(parse, binary)
+            return self._request
+
+    def wait(self, request, timeout, grace=0.0):
+        """等待请求完成，返回结果；超时返回 None。持续收到响应数据时（二进制块或超长的行）不会超时
+
+        grace > 0 时，超时后的 grace 秒内到达的响应仍属于这个请求，到达后被丢弃（见 expect）。
+        """
+        received = 0
+        while not request.done.wait(timeout):
+            with self._lock:
+                # 已收到的响应字节数：移入请求的部分，加上缓冲区中尚未成行的部分
+                total = request.received
+                if self._request is request and not request.binary:
+                    total += len(self.ring)
+                progressing = total > received
+                received = total
+                if not progressing:
+                    if self._request is request:
+                        if grace > 0:
+                            request.deadline = time.monotonic() + grace
+                        else:
+                            self._request = None
+                    break
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run(self):
+        while self._running:
+            try:
+                target = self.ring.writable()
+                if not target:
+                    with self._lock:
+                        self._overflow()
+                    continue
+                count = max(1, min(self.ser.in_waiting, len(target)))
+                data = self.ser.read(count)
+            except Exception as e:
+                if self._running:
+                    self._fail(e)
+                return
+            if data:
+                with self._lock:
+                    target[:len(data)] = data
+                    self.ring.commit(len(data))
+                    self._dispatch()
+
+    def _overflow(self):
+        """缓冲区满且没有完整的行：响应行移入请求的缓冲区，其他数据丢弃到下一个终止符"""
+        ring = self.ring
+        request = self._request
+        if request is not None and not request.binary and not self._skip_line:
+            if request.overflow is None:
+                request.overflow = bytearray()
+            if len(request.overflow) + len(ring) <= self.max_line_length:
+                for segment in ring.segments(len(ring)):
+                    request.overflow += segment
+                request.received += len(ring)
+                ring.consume(len(ring))
+                return
+            self._finish(request, error=ValueError(f"响应超过 {self.max_line_length} 字节"))
+        self.overflows += 1
+        self._skip_line = True
+        ring.clear()
+
+    def _fail(self, error):
+        with self._lock:
+            self.error = error
+            request, self._request = self._request, None
+        if request is not None:
+            request.error = error
+            request.done.set()
+
+    def _finish(self, request, result=None, error=None):
+        if request.deadline is not None:
+            self.late_responses += 1
+        request.result = result
+        request.error = error
+        self._request = None
+        request.done.set()
+
+    def _dispatch(self):
+        ring = self.ring
+        while len(ring):
+            request = self._request
+            if self._skip_terminator:
+                # 丢弃二进制块后的 \r\n
+                byte = ring.peek(1)[0]
+                if byte in (0x0d, 0x0a):
+                    ring.consume(1)
+                    continue
+                self._skip_terminator = False
+
+            if self._skip_line:
+                index = ring.find(b"\n")
+                if index < 0:
+                    ring.clear()
+                    return
+                ring.consume(index + 1)
+                self._skip_line = False
+                continue
+
+            if request is not None and request.binary:
+                if not self._dispatch_block(request):
+                    return
+                continue
+
+            index = ring.find(b"\n")
+            if index < 0:
+                return
+            line = ring.peek(index + 1)
+            if request is not None and request.overflow is not None:
+                request.overflow += line
+                line = memoryview(request.overflow)
+            try:
+                if request is not None:
+                    try:
+                        self._finish(request, request.parse(line))
+                    except Exception as e:
+                        self._finish(request, error=e)
+                elif self.on_unsolicited is not None:
+                    self.on_unsolicited(line)
+            finally:
+                ring.consume(index + 1)
+
+    def _dispatch_block(self, request):
+        """处理二进制块数据，数据不足时返回 False"""
+        ring = self.ring
+        if request.payload is None:
+            if len(ring) < 2:
+                return False
+            head = ring.peek(2)
+            if head[0] != ord("#"):
+                # 不是二进制块（如错误响应）：按行读出后报告错误
+                index = ring.find(b"\n")
+                if index < 0:
+                    return False
+                text = str(ring.peek(index + 1), 'ascii', errors='replace').strip()
+                ring.consume(index + 1)
+                self._finish(request, error=ValueError(f"不是IEEE 488.2二进制块: {text}"))
+                return True
+
+            digit_count = head[1] - ord("0")
+            if digit_count == 0:
+                # 不定长块：以终止符结束
+                index = ring.find(b"\n")
+                if index < 0:
+                    return False
+                request.payload = bytearray(ring.peek(index + 1)[2:index])
+                ring.consume(index + 1)
+                self._finish(request, request.payload)
+                return True
+            if len(ring) < 2 + digit_count:
+                return False
+            length = int(bytes(ring.peek(2 + digit_count)[2:]))
+            ring.consume(2 + digit_count)
+            request.payload = bytearray(length)
+
+        # 把环形缓冲区中的数据段直接拷入目标缓冲区
+        remaining = len(request.payload) - request.received
+        count = min(remaining, len(ring))
+        for segment in ring.segments(count):
+            request.payload[request.received:request.received + len(segment)] = segment
+            request.received += len(segment)
+        ring.consume(count)
+        if request.received < len(request.payload):
+            return False
+        self._skip_terminator = True
+        self._finish(request, request.payload)
+        return True
+
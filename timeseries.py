@@ -0,0 +1,100 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+import numpy as np
+
+# 默认的列：时间戳（Unix 秒）、电压、电流、温度
+STORE_COLUMNS = ("time", "voltage", "current", "temperature")
+
+
+class TimeSeriesStore:
+    """定长环形时间序列存储
+
+    每列一个预分配的 float64 数组，容量固定，写满后覆盖最早的样本，内存不随运行时间增长。
+    每个样本同时写入位置 i 和 i + capacity，因此最近的任意 n 个样本总是一段连续内存，
+    snapshot()/column() 直接返回视图而不拷贝。视图在之后的追加中可能被覆盖，需要保留时请 copy()。
+    """
+
+    def __init__(self, capacity, columns=STORE_COLUMNS):
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self._rows = {name: row for row, name in enumerate(self.columns)}
+        self._data = np.full((len(self.columns), 2 * capacity), np.nan)
+        self._end = 0  # 累计写入的样本数
+
+    def __len__(self):
+        """当前保存的样本数"""
+        return min(self._end, self.capacity)
+
+    @property
+    def total(self):
+        """累计写入的样本数（含已被覆盖的）"""
+        return self._end
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def append(self, samples, columns=None):
+        """追加 (n, k) 样本数组，columns 为这 k 列的列名（默认全部列），未给出的列为 NaN"""
+        samples = np.atleast_2d(np.asarray(samples, dtype=np.float64))
+        count = len(samples)
+        if count == 0:
+            return
+        rows = None if columns is None or tuple(columns) == self.columns else [self._rows[name] for name in columns]
+        if count > self.capacity:
+            # 只有最后 capacity 个样本会留下
+            self._end += count - self.capacity
+            samples = samples[-self.capacity:]
+            count = self.capacity
+
+        start = self._end % self.capacity
+        first = min(count, self.capacity - start)
+        for offset in (0, self.capacity):
+            self._write(offset + start, samples[:first], rows)
+            if count > first:
+                self._write(offset, samples[first:], rows)
+        self._end += count
+
+    def _write(self, position, samples, rows):
+        target = self._data[:, position:position + len(samples)]
+        if rows is None:
+            target[:] = samples.T
+        else:
+            target[:] = np.nan
+            target[rows] = samples.T
+
+    def snapshot(self, count=None):
+        """最近 count 个样本（默认全部）的 (列数, n) 视图，每列在内存中连续"""
+        count = len(self) if count is None else min(count, len(self))
+        start = (self._end - count) % self.capacity
+        return self._data[:, start:start + count]
+
+    def column(self, name, count=None):
+        """某一列最近 count 个样本的连续视图"""
+        return self.snapshot(count)[self._rows[name]]
+
+    def since(self, timestamp):
+        """时间戳不早于 timestamp 的样本的视图（时间戳按写入顺序递增）"""
+        times = self.column("time")
+        return self.snapshot(len(times) - int(np.searchsorted(times, timestamp)))
+
+    def latest(self):
+        """最近一个样本 {列名: 值}，没有样本时返回 None"""
+        if not len(self):
+            return None
+        return dict(zip(self.columns, self.snapshot(1)[:, 0].tolist()))
+
+    def statistics(self, name, seconds=None):
+        """某一列（最近 seconds 秒或全部样本）的统计：{count, mean, std, min, max}，忽略 NaN"""
+        if seconds is None or not len(self):
+            data = self.snapshot()
+        else:
+            data = self.since(self.latest()["time"] - seconds)
+        values = data[self._rows[name]]
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return {"count": 0, "mean": np.nan, "std": np.nan, "min": np.nan, "max": np.nan}
+        return {"count": len(values), "mean": float(values.mean()), "std": float(values.std()),
+                "min": float(values.min()), "max": float(values.max())}
@@ -0,0 +1,341 @@
+# @Time    : ${2026.10.17}
+# @Author  : GYY
+
+
+import math
+import time
+
+import numpy as np
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QPainter, QPen
+from PySide6.QtWidgets import QWidget
+
+
+class ChunkedArray:
+    """按块分配的一维增长数组：追加时不拷贝已有数据，长时间采集也不会出现扩容停顿
+
+    可以整块丢弃最早的数据以限制内存；下标始终是从第一个追加的元素算起的绝对位置，
+    已丢弃的部分从 start 之前开始。
+    """
+
+    def __init__(self, dtype, chunk_size=1 << 20):
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self._chunks = []
+        self._length = 0
+        self._start = 0  # 第一个保留元素的绝对下标（块大小的整数倍）
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def start(self):
+        return self._start
+
+    def discard(self, count):
+        """丢弃绝对下标 count 之前的完整块"""
+        while self._chunks and self._start + self.chunk_size <= min(count, self._length):
+            self._chunks.pop(0)
+            self._start += self.chunk_size
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        done = 0
+        while done < len(values):
+            index, offset = divmod(self._length - self._start, self.chunk_size)
+            if index == len(self._chunks):
+                self._chunks.append(np.empty(self.chunk_size, dtype=self.dtype))
+            count = min(self.chunk_size - offset, len(values) - done)
+            self._chunks[index][offset:offset + count] = values[done:done + count]
+            done += count
+            self._length += count
+
+    def truncate(self, length):
+        """丢弃 length 之后的元素（保留已分配的块）"""
+        self._length = min(self._length, length)
+
+    def __getitem__(self, index):
+        """整数下标取单个元素；切片返回连续数组（不跨块时为视图，不可修改）
+
+        下标为绝对位置，负数从末尾算起；切片中已丢弃的部分被截去。
+        """
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(self._length)
+            return self._slice(max(start, self._start) - self._start, stop - self._start)
+        if index < 0:
+            index += self._length
+        if not self._start <= index < self._length:
+            raise IndexError(index)
+        chunk, offset = divmod(index - self._start, self.chunk_size)
+        return self._chunks[chunk][offset]
+
+    def _slice(self, start, stop):
+        """按保留部分的相对位置切片"""
+        if stop <= start:
+            return np.empty(0, dtype=self.dtype)
+        first, offset = divmod(start, self.chunk_size)
+        last = (stop - 1) // self.chunk_size
+        if first == last:
+            return self._chunks[first][offset:offset + stop - start]
+        parts = [self._chunks[first][offset:]]
+        parts.extend(self._chunks[first + 1:last])
+        parts.append(self._chunks[last][:stop - last * self.chunk_size])
+        return np.concatenate(parts)
+
+    def searchsorted(self, values):
+        """数据单调不减时，values 中各值在保留部分中的插入位置（side="left"，绝对下标）"""
+        values = np.asarray(values)
+        stored = self._length - self._start
+        if stored == 0:
+            return np.full(len(values), self._length, dtype=np.int64)
+        count = (stored - 1) // self.chunk_size + 1
+        firsts = np.array([chunk[0] for chunk in self._chunks[:count]])
+        chunks = np.clip(np.searchsorted(firsts, values, side="right") - 1, 0, count - 1)
+        result = np.empty(len(values), dtype=np.int64)
+        for chunk in np.unique(chunks):
+            mask = chunks == chunk
+            base = chunk * self.chunk_size
+            data = self._chunks[chunk][:min(self.chunk_size, stored - base)]
+            result[mask] = np.searchsorted(data, values[mask]) + base + self._start
+        return result
+
+
+class MinMaxPyramid:
+    """多级最小/最大值金字塔
+
+    第 0 级为原始数据，第 k 级每个元素是 factor**k 个连续样本的最小/最大值（忽略 NaN）。
+    追加时只重新计算各级末尾受影响的块；任意区间按像素列求包络时选用块大小不超过
+    每列样本数的一级，计算量约为 列数 * factor，与数据总量无关。
+    """
+
+    # 原始数据的分块大小；上层按 factor 缩小，不小于 min_chunk_size
+    chunk_size = 1 << 20
+    min_chunk_size = 1 << 12
+
+    def __init__(self, factor=16, dtype=np.float32):
+        self.factor = factor
+        self.dtype = dtype
+        raw = ChunkedArray(dtype, self.chunk_size)
+        self.levels = [(raw, raw)]  # 每级 (最小值, 最大值)
+
+    def __len__(self):
+        return len(self.levels[0][0])
+
+    def append(self, values):
+        raw = self.levels[0][0]
+        changed, length = len(raw), len(raw) + len(values)
+        raw.append(values)
+
+        level = 1
+        while level < len(self.levels) or length > self.factor:
+            if level == len(self.levels):
+                size = max(self.min_chunk_size, self.chunk_size // self.factor ** level)
+                self.levels.append((ChunkedArray(self.dtype, size), ChunkedArray(self.dtype, size)))
+            below_mins, below_maxs = self.levels[level - 1]
+            mins, maxs = self.levels[level]
+            # 从第一个受影响的块开始重新计算
+            block = changed // self.factor
+            start = block * self.factor
+            edges = np.arange(0, length - start, self.factor)
+            mins.truncate(block)
+            maxs.truncate(block)
+            mins.append(np.fmin.reduceat(below_mins[start:length], edges))
+            maxs.append(np.fmax.reduceat(below_maxs[start:length], edges))
+            changed, length = block, len(mins)
+            level += 1
+
+    def discard(self, count):
+        """丢弃前 count 个原始样本（及各级对应的块）所在的完整块"""
+        for level, (mins, maxs) in enumerate(self.levels):
+            mins.discard(count // self.factor ** level)
+            if maxs is not mins:
+                maxs.discard(count // self.factor ** level)
+
+    def envelope(self, edges):
+        """按样本下标边界（单调不减，长度为列数+1）计算每列的最小/最大值，空列为 NaN
+
+        边界按所选级别的块取整，误差不超过一个块（小于一列）。
+        """
+        edges = np.asarray(edges, dtype=np.int64)
+        count = len(edges) - 1
+        per_column = (edges[-1] - edges[0]) / max(1, count)
+        level = 0
+        while level + 1 < len(self.levels) and self.factor ** (level + 1) <= per_column:
+            level += 1
+        size = self.factor ** level
+        level_mins, level_maxs = self.levels[level]
+
+        blocks = np.clip((edges + size // 2) // size, level_mins.start, len(level_mins))
+        mins = np.full(count, np.nan)
+        maxs = np.full(count, np.nan)
+        valid = blocks[1:] > blocks[:-1]
+        if valid.any():
+            first, last = blocks[0], blocks[-1]
+            starts = blocks[:-1][valid] - first
+            mins[valid] = np.fmin.reduceat(level_mins[first:last], starts)
+            maxs[valid] = np.fmax.reduceat(level_maxs[first:last], starts)
+        return mins, maxs
+
+
+class TraceBuffer:
+    """历史样本：时间戳（float64）和各通道的最小/最大值金字塔（float32，精度足够绘图）
+
+    capacity 不为 None 时最多保留约 capacity 个样本，超出后整块丢弃最早的数据，内存不再增长。
+    """
+
+    def __init__(self, channels=2, factor=16, capacity=None):
+        self.times = ChunkedArray(np.float64, MinMaxPyramid.chunk_size)
+        self.channels = [MinMaxPyramid(factor) for _ in range(channels)]
+        self.capacity = capacity
+
+    def __len__(self):
+        """保留的样本数"""
+        return len(self.times) - self.times.start
+
+    @property
+    def first_time(self):
+        return self.times[self.times.start]
+
+    @property
+    def last_time(self):
+        return self.times[-1]
+
+    def append(self, samples):
+        """追加 (n, 1 + 通道数) 的样本数组，第一列为时间戳；时间不递增的样本被丢弃"""
+        samples = np.asarray(samples, dtype=np.float64)
+        if not len(samples):
+            return
+        times = samples[:, 0]
+        keep = np.diff(np.maximum.accumulate(times), prepend=-np.inf) > 0
+        if len(self.times):
+            keep &= times > self.times[-1]
+        samples = samples[keep]
+        if not len(samples):
+            return
+        self.times.append(samples[:, 0])
+        for index, channel in enumerate(self.channels, 1):
+            channel.append(samples[:, index])
+
+        if self.capacity is not None and len(self) > self.capacity:
+            # 丢弃的位置以时间戳数组为准，各通道与之对齐
+            self.times.discard(len(self.times) - self.capacity)
+            for channel in self.channels:
+                channel.discard(self.times.start)
+
+    def columns(self, first, count, dt):
+        """绝对列号 first 起 count 列（每列 dt 秒，第 k 列为 [k*dt, (k+1)*dt)）的包络
+
+        返回每个通道的 (最小值, 最大值) 列表。
+        """
+        edges = self.times.searchsorted((first + np.arange(count + 1)) * dt)
+        return [channel.envelope(edges) for channel in self.channels]
+
+
+class TracePlot(QWidget):
+    """实时曲线：每个像素列绘制该时间段内的最小/最大值包络，各通道上下分区显示
+
+    像素列按绝对时间对齐，滚动时已计算的列直接平移复用，新样本到达后只重新计算
+    最后一列之后的列；缩放（修改时间跨度或窗口宽度）时才整体重新计算。
+    每帧耗时与像素宽度有关，与存储的样本数无关。
+    """
+
+    margin = 60  # 左侧留给坐标标注的宽度（像素）
+    colors = ("#1f77b4", "#d62728", "#2ca02c", "#9467bd")
+
+    def __init__(self, buffer, labels, parent=None):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.labels = labels
+        self.span = 60.0  # 显示的时间跨度（秒），None 表示全部数据
+        self.frame_time = 0.0  # 最近一帧的绘制耗时（秒）
+        self._cache = None  # (dt, 首列, 列数, 各通道包络, 仍可能变化的首列)
+        self.setMinimumHeight(200)
+
+    def set_span(self, span):
+        self.span = span
+        self._cache = None
+        self.update()
+
+    def _columns(self, first, count, dt, last_column):
+        """可见列的包络：复用缓存中已完成的列，只计算新出现和仍在变化的列"""
+        cache = self._cache
+        if cache is not None and cache[0] == dt and cache[2] == count and 0 <= first - cache[1] < count:
+            shift = first - cache[1]
+            stale = max(cache[4], first) - first
+            envelopes = []
+            for mins, maxs in cache[3]:
+                mins = np.concatenate([mins[shift:], np.full(shift, np.nan)])
+                maxs = np.concatenate([maxs[shift:], np.full(shift, np.nan)])
+                envelopes.append((mins, maxs))
+            fresh = self.buffer.columns(first + stale, count - stale, dt)
+            for (mins, maxs), (new_mins, new_maxs) in zip(envelopes, fresh):
+                mins[stale:] = new_mins
+                maxs[stale:] = new_maxs
+        else:
+            envelopes = self.buffer.columns(first, count, dt)
+        # 最后一个样本所在的列之后可能还会收到样本
+        self._cache = (dt, first, count, envelopes, last_column)
+        return envelopes
+
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("white"))
+        count = max(1, self.width() - self.margin - 10)
+        length = len(self.buffer)
+        if length == 0:
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "无数据")
+            return
+
+        last_time = self.buffer.last_time
+        span = self.span or max(last_time - self.buffer.first_time, 1e-3)
+        dt = span / count
+        last_column = math.floor(last_time / dt)
+        first = last_column - count + 1
+        envelopes = self._columns(first, count, dt, last_column)
+
+        band = self.height() / len(envelopes)
+        for index, (mins, maxs) in enumerate(envelopes):
+            rect = QRectF(self.margin, index * band + 15, count, band - 25)
+            self._draw_envelope(painter, rect, mins, maxs, self.colors[index % len(self.colors)],
+                                self.labels[index])
+        painter.setPen(QColor("gray"))
+        painter.drawText(QRectF(self.margin, self.height() - 15, count, 15), Qt.AlignmentFlag.AlignRight,
+                         f"最近 {span:.1f} s, {length} 个样本, 绘制 {self.frame_time * 1000:.1f} ms")
+        painter.end()
+        self.frame_time = time.perf_counter() - start
+
+    def _draw_envelope(self, painter, rect, mins, maxs, color, label):
+        """绘制一个通道：每列从最小值到最大值的竖线依次相连，空列处断开"""
+        painter.setPen(QColor("lightgray"))
+        painter.drawRect(rect)
+        painter.setPen(QColor("black"))
+        painter.drawText(QRectF(0, rect.top() - 15, rect.right(), 15), Qt.AlignmentFlag.AlignLeft, label)
+        if np.isnan(mins).all():
+            return
+
+        low, high = float(np.nanmin(mins)), float(np.nanmax(maxs))
+        if high - low < 1e-9:
+            low, high = low - 0.5e-6, high + 0.5e-6
+        painter.drawText(QRectF(0, rect.top(), self.margin - 4, 15), Qt.AlignmentFlag.AlignRight, f"{high:.6g}")
+        painter.drawText(QRectF(0, rect.bottom() - 15, self.margin - 4, 15), Qt.AlignmentFlag.AlignRight,
+                         f"{low:.6g}")
+
+        scale = rect.height() / (high - low)
+        tops = rect.bottom() - (maxs - low) * scale
+        bottoms = rect.bottom() - (mins - low) * scale
+        painter.setPen(QPen(QColor(color), 1))
+        points = []
+        for column, (top, bottom) in enumerate(zip(tops.tolist(), bottoms.tolist())):
+            if top != top:  # NaN：该列没有样本
+                if len(points) > 1:
+                    painter.drawPolyline(points)
+                points = []
+                continue
+            x = rect.left() + column + 0.5
+            points.append(QPointF(x, bottom))
+            points.append(QPointF(x, top))
+        if len(points) > 1:
+            painter.drawPolyline(points)
+        elif points:
+            painter.drawPoint(points[0])
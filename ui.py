@@ -12,6 +12,9 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                                QDoubleSpinBox, QSpinBox)
 from PySide6.QtCore import Qt
 
+from calibration import CalibrationCache, download_calibration
+from scpi_session import join_commands, pack_commands, split_compound
+
 # 常量定义
 BAUD_RATE = 115200
 TIMEOUT = 0.5
@@ -20,11 +23,15 @@ CURRENT_RANGE = (0, 40)
 VOLTAGE_DECIMALS = 6
 CURRENT_DECIMALS = 6
 STEP_SIZE = 0.000001
+CAL_PARAM_COUNT = 16  # 8个档位 × 正/负电压参数
+MAX_LINE_LENGTH = 128  # 复合命令单行最大长度
 
 
 class PowerSupplyControl(QMainWindow):
     def __init__(self):
         super().__init__()
+        # 校准参数缓存：切换档位时不再查询设备
+        self.cal_cache = CalibrationCache()
         self.init_ui()
         self.ser = None
 
@@ -543,6 +550,14 @@ class PowerSupplyControl(QMainWindow):
                 if response:
                     self.response_display.append(f"设备标识: {response}")
 
+                # 一次复合请求加载全部校准参数，之后的 *RCL 直接读缓存
+                self.cal_cache.invalidate()
+                table = download_calibration(self.send_scpi_batch, CAL_PARAM_COUNT, self.cal_cache)
+                self.response_display.append(
+                    f"已加载 {len(table) - len(table.missing())}/{len(table)} 个校准参数 "
+                    f"(用时 {table.elapsed * 1000:.1f} ms)"
+                )
+
                 # 初始化输出按钮状态
                 self.output_on_btn.setEnabled(True)
                 self.output_off_btn.setEnabled(False)
@@ -560,6 +575,7 @@ class PowerSupplyControl(QMainWindow):
 
                 self.ser.close()
                 self.ser = None
+                self.cal_cache.invalidate()
                 self.connect_btn.setText("连接")
                 self.response_display.append("已断开连接")
 
@@ -582,6 +598,12 @@ class PowerSupplyControl(QMainWindow):
             self.log_message("错误：未连接到设备")
             return None
 
+        # *RCL 命中校准参数缓存时不访问设备
+        cached = self.cal_cache.lookup(command)
+        if cached is not None:
+            self.response_display.append(f"收到响应(缓存): {cached}")
+            return cached
+
         try:
             if self.ser:
                 # 清空输入缓冲区
@@ -626,6 +648,7 @@ class PowerSupplyControl(QMainWindow):
                             if response.startswith("**ERROR"):
                                 self.response_display.append("命令不被支持")
                                 return None
+                            self.cal_cache.update(command, response)
                             return response
                         else:
                             self.response_display.append("警告：未收到响应")
@@ -636,6 +659,8 @@ class PowerSupplyControl(QMainWindow):
                         hex_response = ' '.join([f'{b:02x}' for b in raw_response])
                         self.response_display.append(f"原始响应(hex): {hex_response}")
                         return None
+                # *SAV 写穿到校准参数缓存
+                self.cal_cache.update(command, "OK")
                 return "OK"  # 非查询命令返回OK
             else:
                 self.response_display.append("错误：未连接到设备")
@@ -644,6 +669,14 @@ class PowerSupplyControl(QMainWindow):
             self.response_display.append(f"命令发送错误: {str(e)}")
             return None
 
+    def send_scpi_batch(self, commands):
+        """批量发送命令：用 ";" 合并为尽量少的复合命令行，返回与 commands 对应的结果列表"""
+        results = []
+        for line_commands in pack_commands(commands, MAX_LINE_LENGTH):
+            response = self.send_scpi_command(join_commands(line_commands))
+            results.extend(split_compound(line_commands, response, self.response_display.append))
+        return results
+
     def send_command(self):
         """用户界面的命令发送"""
         try:
@@ -2,31 +2,87 @@
 # @Author  : GYY
 
 
+import asyncio
 import sys
+import time
 
-import serial
-import serial.tools.list_ports
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                                QHBoxLayout, QLabel, QLineEdit, QPushButton,
                                QTextEdit, QGroupBox, QGridLayout, QComboBox,
-                               QDoubleSpinBox, QSpinBox)
-from PySide6.QtCore import Qt
+                               QDoubleSpinBox, QSpinBox, QCheckBox, QFileDialog)
+from PySide6.QtCore import Qt, QTimer
+from PySide6 import QtAsyncio
+
+from calibration import download_calibration
+from instrument_manager import InstrumentManager, identify_ports
+from live_monitor import LiveMonitor
+from port_watcher import PortWatcher, port_key
+from recorder import SessionRecorder
+from scpi_async import async_slot
+from scpi_numeric import parse_number
+from scpi_session import ScpiSession
+from timeseries import TimeSeriesStore
+from trace_plot import TraceBuffer, TracePlot
 
 # 常量定义
 BAUD_RATE = 115200
+BAUD_RATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
 TIMEOUT = 0.5
+IDENTIFY_TIMEOUT = 0.5  # 识别设备时每个端口的应答超时（所有端口同时探测）
 VOLTAGE_RANGE = (-10.5, 10.5)
 CURRENT_RANGE = (0, 40)
 VOLTAGE_DECIMALS = 6
 CURRENT_DECIMALS = 6
 STEP_SIZE = 0.000001
+CAL_PARAM_COUNT = 4  # 校准参数个数（*RCL/*SAV 1-4）
+MONITOR_RATE_RANGE = (0.1, 1000)  # 实时监视采样率范围（Hz），链路跟不上时按最高速率采样
+MONITOR_DISPLAY_INTERVAL = 100  # 实时监视显示刷新间隔（毫秒）
+STORE_CAPACITY = 1 << 19  # 实时数据存储的样本数（约 35 分钟 @ 250 Hz，内存固定）
+PLOT_CAPACITY = 1 << 23  # 曲线保留的样本数（约 9 小时 @ 250 Hz），超出后丢弃最早的数据
+PLOT_SPANS = (("10 s", 10.0), ("1 min", 60.0), ("10 min", 600.0), ("1 h", 3600.0), ("全部", None))
 
 
 class PowerSupplyControl(QMainWindow):
     def __init__(self):
         super().__init__()
+        # 启动计时：界面构建完成时间和首次绘制时间
+        self.startup_start = time.perf_counter()
+        self.first_paint = None
+        self.session = ScpiSession(self)
+        self.manager = InstrumentManager(self)
+        self.monitor = LiveMonitor(self.session, self)
+        # 实时监视的样本：定长存储用于读数和统计，曲线缓冲区（曲线分组首次展开前也保存）；内存都有上限
+        self.store = TimeSeriesStore(STORE_CAPACITY)
+        self.trace_buffer = TraceBuffer(channels=2, capacity=PLOT_CAPACITY)
+        self.monitor.samples.connect(self.record_samples)
+        self.recorder = None  # 录制中的 SessionRecorder
+        self.calibrating = False  # 设备是否处于校准模式（OUTPut:CALIbrate 1）
+        # 串口热插拔监视；已连接过的设备标识（可自动连接），当前连接设备的标识
+        self.port_watcher = PortWatcher(self)
+        self.known_devices = set()
+        self.connected_key = None
+        self.identities = {}  # 端口 -> 识别到的设备标识
         self.init_ui()
-        self.ser = None
+        self.session.message.connect(self.response_display.append)
+        self.manager.message.connect(self.response_display.append)
+        self.build_time = time.perf_counter() - self.startup_start
+
+    def paintEvent(self, event):
+        """记录首次绘制时间"""
+        super().paintEvent(event)
+        if self.first_paint is None:
+            self.first_paint = time.perf_counter() - self.startup_start
+            self.response_display.append(
+                f"启动用时: 构建界面 {self.build_time * 1000:.1f} ms, 首次绘制 {self.first_paint * 1000:.1f} ms")
+
+    def closeEvent(self, event):
+        """关闭窗口时停止会话线程"""
+        self.port_watcher.stop()
+        self.monitor.stop()
+        self.stop_recording()
+        self.session.shutdown()
+        self.manager.shutdown()
+        super().closeEvent(event)
 
     def init_ui(self):
         """初始化UI界面"""
@@ -36,34 +92,53 @@ class PowerSupplyControl(QMainWindow):
         # 创建主窗口部件
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
-        main_layout = QVBoxLayout(central_widget)
+        self.main_layout = QVBoxLayout(central_widget)
 
-        # 创建串口对象
-        self.ser = None
+        # 延迟创建的分组：名称 -> (占位按钮, 创建函数)；已创建的分组
+        self.lazy_groups = {}
+        self.groups = {}
 
         # 创建组件
         self.response_group = self.create_response_group()
         connection_group = self.create_connection_group()
-        control_group = self.create_control_group()
-        limit_control_group = self.create_limit_control_group()
-        command_group = self.create_command_group()
         system_control_group = self.create_system_control_group()
         control_group = self.create_control_group()
+        monitor_group = self.create_monitor_group()
         limit_control_group = self.create_limit_control_group()
-        calibration_group = self.create_calibration_group()
         command_group = self.create_command_group()
 
-        # 添加到主布局
-        main_layout.addWidget(connection_group)
-        main_layout.addWidget(system_control_group)
-        main_layout.addWidget(control_group)
-        main_layout.addWidget(limit_control_group)
-        main_layout.addWidget(calibration_group)
-        main_layout.addWidget(command_group)
-        main_layout.addWidget(self.response_group)
-
-        # 刷新设备列表
-        self.refresh_devices()
+        # 添加到主布局（校准和多仪器控制较少使用，首次展开时才创建）
+        self.main_layout.addWidget(connection_group)
+        self.main_layout.addWidget(system_control_group)
+        self.main_layout.addWidget(control_group)
+        self.main_layout.addWidget(monitor_group)
+        self.add_lazy_group("plot", "实时曲线", self.create_plot_group)
+        self.main_layout.addWidget(limit_control_group)
+        self.add_lazy_group("calibration", "校准控制", self.create_calibration_group)
+        self.main_layout.addWidget(command_group)
+        self.add_lazy_group("multi_device", "多仪器控制", self.create_multi_device_group)
+        self.main_layout.addWidget(self.response_group)
+
+        # 枚举串口可能阻塞，等事件循环启动后由监视线程在后台扫描，之后增量更新设备列表
+        self.port_watcher.changed.connect(self.ports_changed)
+        QTimer.singleShot(0, self.port_watcher.start)
+
+    def add_lazy_group(self, name, title, factory):
+        """在主布局中添加占位按钮，点击时才调用 factory() 创建分组"""
+        button = QPushButton(f"显示{title}")
+        button.clicked.connect(lambda: self.build_group(name))
+        self.main_layout.addWidget(button)
+        self.lazy_groups[name] = (button, factory)
+
+    def build_group(self, name):
+        """创建延迟分组并替换占位按钮，已创建时直接返回"""
+        if name not in self.groups:
+            button, factory = self.lazy_groups[name]
+            group = factory()
+            self.main_layout.replaceWidget(button, group)
+            button.deleteLater()
+            self.groups[name] = group
+        return self.groups[name]
 
     def create_calibration_group(self):
         """创建校准控制组"""
@@ -161,6 +236,9 @@ class PowerSupplyControl(QMainWindow):
         cal_button_layout.addWidget(self.cal_on_btn)
         cal_button_layout.addWidget(self.cal_off_btn)
         cal_button_layout.setSpacing(4)
+        # 分组可能在连接之后才创建：按当前校准模式设置按钮状态
+        self.cal_on_btn.setEnabled(not self.calibrating)
+        self.cal_off_btn.setEnabled(self.calibrating)
         cal_button_layout.setContentsMargins(0, 0, 0, 0)
 
         # 在最后一行添加校准控制按钮
@@ -173,12 +251,15 @@ class PowerSupplyControl(QMainWindow):
     def calibrate_voltage1(self):
         """电压校准参数1"""
         try:
-            if self.ser:
+            if self.session.is_open:
                 cal1 = self.voltage_cal1_input.value()
+
+                def done(result):
+                    self.response_display.append(f"设置电压校准参数1: {cal1:.6f}V")
+                    self.response_display.append("电压参数1校准完成")
+
                 # 设置正基准并测量
-                self.send_scpi_command(f"*SAV 1,{cal1:.6f}")
-                self.response_display.append(f"设置电压校准参数1: {cal1:.6f}V")
-                self.response_display.append("电压参数1校准完成")
+                self.session.command(f"*SAV 1,{cal1:.6f}", done, "电压校准参数1错误")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -187,12 +268,15 @@ class PowerSupplyControl(QMainWindow):
     def calibrate_voltage2(self):
         """电压校准参数2"""
         try:
-            if self.ser:
+            if self.session.is_open:
                 cal2 = self.voltage_cal2_input.value()
+
+                def done(result):
+                    self.response_display.append(f"设置电压校准参数2: {cal2:.6f}V")
+                    self.response_display.append("电压参数2校准完成")
+
                 # 设置负基准并测量
-                self.send_scpi_command(f"*SAV 2,{cal2:.6f}")
-                self.response_display.append(f"设置电压校准参数2: {cal2:.6f}V")
-                self.response_display.append("电压参数2校准完成")
+                self.session.command(f"*SAV 2,{cal2:.6f}", done, "电压校准参数2错误")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -201,12 +285,15 @@ class PowerSupplyControl(QMainWindow):
     def calibrate_current1(self):
         """电流校准参数3"""
         try:
-            if self.ser:
+            if self.session.is_open:
                 cal1 = self.current_cal1_input.value()
+
+                def done(result):
+                    self.response_display.append(f"设置电流校准参数3: {cal1:.6f}mA")
+                    self.response_display.append("电流参数3校准完成")
+
                 # 设置40mA并测量
-                self.send_scpi_command(f"*SAV 3,{cal1:.6f}")
-                self.response_display.append(f"设置电流校准参数3: {cal1:.6f}mA")
-                self.response_display.append("电流参数3校准完成")
+                self.session.command(f"*SAV 3,{cal1:.6f}", done, "电流校准参数3错误")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -215,27 +302,37 @@ class PowerSupplyControl(QMainWindow):
     def calibrate_current2(self):
         """电流校准参数4"""
         try:
-            if self.ser:
+            if self.session.is_open:
                 cal2 = self.current_cal2_input.value()
+
+                def done(result):
+                    self.response_display.append(f"设置电流校准参数4: {cal2:.6f}mA")
+                    self.response_display.append("电流参数4校准完成")
+
                 # 设置1mA并测量
-                self.send_scpi_command(f"*SAV 4,{cal2:.6f}")
-                self.response_display.append(f"设置电流校准参数4: {cal2:.6f}mA")
-                self.response_display.append("电流参数4校准完成")
+                self.session.command(f"*SAV 4,{cal2:.6f}", done, "电流校准参数4错误")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
             self.response_display.append(f"电流校准参数4错误: {str(e)}")
 
+    def set_calibrating(self, calibrating):
+        """记录校准模式并更新开启/关闭校准按钮（校准分组已创建时）"""
+        self.calibrating = calibrating
+        if "calibration" in self.groups:
+            self.cal_on_btn.setEnabled(not calibrating)
+            self.cal_off_btn.setEnabled(calibrating)
+
     def turn_calibration_on(self):
         """开启校准模式"""
         try:
-            if self.ser:
-                result = self.send_scpi_command("OUTPut:CALIbrate 1")
-                if result is not None:
-                    self.response_display.append("Calibrating...")
-                    # 更新按钮状态
-                    self.cal_on_btn.setEnabled(False)
-                    self.cal_off_btn.setEnabled(True)
+            if self.session.is_open:
+                def done(result):
+                    if result is not None:
+                        self.response_display.append("Calibrating...")
+                        self.set_calibrating(True)
+
+                self.session.command("OUTPut:CALIbrate 1", done, "开启校准错误")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -244,16 +341,21 @@ class PowerSupplyControl(QMainWindow):
     def turn_calibration_off(self):
         """关闭校准模式"""
         try:
-            if self.ser:
-                result = self.send_scpi_command("OUTPut:CALIbrate 0")
-                if result is not None:
+            if self.session.is_open:
+                def job(transport):
+                    result = transport.send("OUTPut:CALIbrate 0")
+                    if result is None:
+                        return None
                     # 查询芯片名称
-                    chip_name = self.send_scpi_command("*IDN?")
-                    if chip_name:
-                        self.response_display.append(f"芯片名称: {chip_name}")
-                    # 更新按钮状态
-                    self.cal_on_btn.setEnabled(True)
-                    self.cal_off_btn.setEnabled(False)
+                    return transport.send("*IDN?") or ""
+
+                def done(chip_name):
+                    if chip_name is not None:
+                        if chip_name:
+                            self.response_display.append(f"芯片名称: {chip_name}")
+                        self.set_calibrating(False)
+
+                self.session.submit(job, done, "关闭校准错误")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -267,12 +369,27 @@ class PowerSupplyControl(QMainWindow):
         self.device_selector = QComboBox()
         self.refresh_btn = QPushButton("刷新设备列表")
         self.refresh_btn.clicked.connect(self.refresh_devices)
+        self.identify_btn = QPushButton("识别所有设备")
+        self.identify_btn.clicked.connect(self.identify_devices)
         self.connect_btn = QPushButton("连接")
         self.connect_btn.clicked.connect(self.handle_connection)
 
+        # 波特率（可手动输入）及连接后协商更高波特率
+        self.baud_selector = QComboBox()
+        self.baud_selector.setEditable(True)
+        self.baud_selector.addItems([str(rate) for rate in BAUD_RATES])
+        self.baud_selector.setCurrentText(str(BAUD_RATE))
+        self.negotiate_check = QCheckBox("协商更高波特率")
+        self.auto_connect_check = QCheckBox("自动连接已知设备")
+
         layout.addWidget(QLabel("选择设备:"))
         layout.addWidget(self.device_selector)
         layout.addWidget(self.refresh_btn)
+        layout.addWidget(self.identify_btn)
+        layout.addWidget(QLabel("波特率:"))
+        layout.addWidget(self.baud_selector)
+        layout.addWidget(self.negotiate_check)
+        layout.addWidget(self.auto_connect_check)
         layout.addWidget(self.connect_btn)
 
         group.setLayout(layout)
@@ -299,11 +416,16 @@ class PowerSupplyControl(QMainWindow):
         self.temp_btn = QPushButton("查询系统温度")
         self.temp_btn.clicked.connect(self.query_temperature)
 
+        # 刷新标识/固件版本缓存按钮
+        self.refresh_cache_btn = QPushButton("刷新缓存")
+        self.refresh_cache_btn.clicked.connect(self.refresh_cache)
+
         # 添加到布局
         layout.addWidget(self.idn_btn)
         layout.addWidget(self.rst_btn)
         layout.addWidget(self.firmware_btn)
         layout.addWidget(self.temp_btn)
+        layout.addWidget(self.refresh_cache_btn)
 
         group.setLayout(layout)
         return group
@@ -396,6 +518,71 @@ class PowerSupplyControl(QMainWindow):
         group.setLayout(layout)
         return group
 
+    def create_monitor_group(self):
+        """创建实时监视组"""
+        group = QGroupBox("实时监视")
+        layout = QHBoxLayout()
+
+        self.monitor_rate_spinbox = QDoubleSpinBox()
+        self.monitor_rate_spinbox.setRange(*MONITOR_RATE_RANGE)
+        self.monitor_rate_spinbox.setDecimals(1)
+        self.monitor_rate_spinbox.setValue(self.monitor.rate)
+        self.monitor_rate_spinbox.setSuffix(" Hz")
+        self.monitor_rate_spinbox.valueChanged.connect(self.set_monitor_rate)
+        self.monitor_btn = QPushButton("开始监视")
+        self.monitor_btn.clicked.connect(self.toggle_monitor)
+        self.monitor_temperature_check = QCheckBox("含温度")
+        self.record_btn = QPushButton("开始录制")
+        self.record_btn.clicked.connect(self.toggle_recording)
+
+        self.monitor_voltage_label = QLabel("电压: --")
+        self.monitor_current_label = QLabel("电流: --")
+        self.monitor_temperature_label = QLabel("温度: --")
+        self.monitor_rate_label = QLabel("采样率: --")
+
+        # 显示按固定间隔刷新，与采样率无关
+        self.monitor_timer = QTimer(self)
+        self.monitor_timer.setInterval(MONITOR_DISPLAY_INTERVAL)
+        self.monitor_timer.timeout.connect(self.update_monitor_display)
+
+        layout.addWidget(QLabel("采样率:"))
+        layout.addWidget(self.monitor_rate_spinbox)
+        layout.addWidget(self.monitor_temperature_check)
+        layout.addWidget(self.monitor_btn)
+        layout.addWidget(self.record_btn)
+        layout.addWidget(self.monitor_voltage_label)
+        layout.addWidget(self.monitor_current_label)
+        layout.addWidget(self.monitor_temperature_label)
+        layout.addWidget(self.monitor_rate_label)
+        layout.addStretch()
+
+        group.setLayout(layout)
+        return group
+
+    def create_plot_group(self):
+        """创建实时曲线组"""
+        group = QGroupBox("实时曲线")
+        layout = QVBoxLayout()
+
+        span_layout = QHBoxLayout()
+        self.plot_span_selector = QComboBox()
+        for name, span in PLOT_SPANS:
+            self.plot_span_selector.addItem(name, span)
+        self.plot_span_selector.setCurrentIndex(1)
+        self.plot_span_selector.currentIndexChanged.connect(
+            lambda index: self.trace_plot.set_span(self.plot_span_selector.itemData(index)))
+        span_layout.addWidget(QLabel("时间跨度:"))
+        span_layout.addWidget(self.plot_span_selector)
+        span_layout.addStretch()
+
+        self.trace_plot = TracePlot(self.trace_buffer, ("电压(V)", "电流(mA)"))
+        self.trace_plot.set_span(self.plot_span_selector.currentData())
+
+        layout.addLayout(span_layout)
+        layout.addWidget(self.trace_plot)
+        group.setLayout(layout)
+        return group
+
     def create_command_group(self):
         """创建命令输入控制组"""
         group = QGroupBox("命令输入")
@@ -410,6 +597,29 @@ class PowerSupplyControl(QMainWindow):
         group.setLayout(layout)
         return group
 
+    def create_multi_device_group(self):
+        """创建多仪器控制组"""
+        group = QGroupBox("多仪器控制")
+        layout = QHBoxLayout()
+
+        self.connect_all_btn = QPushButton("连接全部设备")
+        self.connect_all_btn.clicked.connect(self.connect_all_devices)
+        self.set_voltage_all_btn = QPushButton("全部设置电压")
+        self.set_voltage_all_btn.clicked.connect(self.set_voltage_all)
+        self.read_current_all_btn = QPushButton("全部读取电流")
+        self.read_current_all_btn.clicked.connect(self.read_current_all)
+        self.disconnect_all_btn = QPushButton("断开全部")
+        self.disconnect_all_btn.clicked.connect(self.disconnect_all_devices)
+        self.device_count_label = QLabel("已连接: 0 台")
+
+        layout.addWidget(self.connect_all_btn)
+        layout.addWidget(self.set_voltage_all_btn)
+        layout.addWidget(self.read_current_all_btn)
+        layout.addWidget(self.disconnect_all_btn)
+        layout.addWidget(self.device_count_label)
+        group.setLayout(layout)
+        return group
+
     def create_response_group(self):
         group = QGroupBox("响应显示")
         layout = QVBoxLayout()
@@ -421,28 +631,48 @@ class PowerSupplyControl(QMainWindow):
         group.setLayout(layout)
         return group
 
-    def query_identification(self):
+    @async_slot
+    async def query_identification(self):
         """查询仪器标识"""
         try:
-            if self.ser:
-                response = self.send_scpi_command("*IDN?")
+            if self.session.is_open:
+                response = await self.session.send("*IDN?")
                 self.response_display.append(f"仪器标识: {response}")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
             self.response_display.append(f"查询标识错误: {str(e)}")
 
+    def refresh_cache(self):
+        """清空标识/固件版本和校准参数缓存，并显示缓存命中统计"""
+        try:
+            def job(transport):
+                stats = transport.cache_stats()
+                transport.invalidate_cache()
+                transport.calibration.invalidate()
+                return stats
+
+            def done(stats):
+                self.response_display.append(
+                    f"缓存已刷新 (命中: {stats['hits']}, 未命中: {stats['misses']})")
+
+            self.session.submit(job, done, "刷新缓存错误")
+        except Exception as e:
+            self.response_display.append(f"刷新缓存错误: {str(e)}")
+
     def reset_instrument(self):
         """重置仪器"""
         try:
-            if self.ser:
-                self.send_scpi_command("*RST")
-                self.response_display.append("仪器已重置")
-                # 更新显示
-                self.voltage_spinbox.setValue(0)
-                self.current_spinbox.setValue(0)
-                self.output_on_btn.setEnabled(True)
-                self.output_off_btn.setEnabled(False)
+            if self.session.is_open:
+                def done(result):
+                    self.response_display.append("仪器已重置")
+                    # 更新显示
+                    self.voltage_spinbox.setValue(0)
+                    self.current_spinbox.setValue(0)
+                    self.output_on_btn.setEnabled(True)
+                    self.output_off_btn.setEnabled(False)
+
+                self.session.command("*RST", done, "重置错误")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -451,184 +681,196 @@ class PowerSupplyControl(QMainWindow):
     def clear_status(self):
         """清除状态寄存器"""
         try:
-            if self.ser:
-                self.send_scpi_command("*CLS")
-                self.response_display.append("状态寄存器已清除")
+            if self.session.is_open:
+                self.session.command(
+                    "*CLS",
+                    lambda result: self.response_display.append("状态寄存器已清除"),
+                    "清除状态错误"
+                )
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
             self.response_display.append(f"清除状态错误: {str(e)}")
 
-    def refresh_devices(self):
-        """刷新可用的串口设备列表"""
+    @async_slot
+    async def refresh_devices(self):
+        """立即重新扫描串口（平时由热插拔监视自动更新设备列表）"""
         try:
-            self.device_selector.clear()
+            self.refresh_btn.setEnabled(False)
             self.response_display.append("正在搜索设备...")
 
-            # 获取所有串口设备
-            ports = serial.tools.list_ports.comports()
-
-            if ports:
-                for port in ports:
-                    self.device_selector.addItem(f"{port.device} - {port.description}")
-                    self.response_display.append(f"发现设备: {port.device} - {port.description}")
-            else:
+            # comports() 在设备较多的系统上可能阻塞，放到线程池中执行；变化经 ports_changed 更新列表
+            await asyncio.to_thread(self.port_watcher.poll, True)
+            if not self.port_watcher.ports:
                 self.response_display.append("未找到串口设备")
 
         except Exception as e:
             self.response_display.append(f"刷新设备列表出错: {str(e)}")
+        finally:
+            self.refresh_btn.setEnabled(True)
+
+    @async_slot
+    async def identify_devices(self):
+        """同时探测列表中所有未连接的端口（*IDN?），在设备列表中标出型号和序列号"""
+        try:
+            ports = [self.device_selector.itemText(i).split(' - ')[0]
+                     for i in range(self.device_selector.count())]
+            ports = [port for port in ports
+                     if port and port != self.session.transport.port and port not in self.manager.sessions]
+            if not ports:
+                self.response_display.append("没有可识别的端口")
+                return
+            baudrate = self.selected_baudrate()
+            if baudrate is None:
+                return
+
+            self.identify_btn.setEnabled(False)
+            self.response_display.append(f"正在识别 {len(ports)} 个端口...")
+            start = time.perf_counter()
+            identities = await asyncio.to_thread(identify_ports, ports, baudrate, IDENTIFY_TIMEOUT)
+            elapsed = time.perf_counter() - start
+
+            self.identities.update(identities)
+            for i in range(self.device_selector.count()):
+                port = self.device_selector.itemText(i).split(' - ')[0]
+                if port in identities:
+                    identity = identities[port]
+                    self.device_selector.setItemText(i, f"{port} - {identity.model} ({identity.serial})")
+                    self.response_display.append(f"{port}: {identity}")
+            self.response_display.append(
+                f"识别到 {len(identities)}/{len(ports)} 个设备 (用时 {elapsed * 1000:.0f} ms)")
+        except Exception as e:
+            self.response_display.append(f"识别设备错误: {str(e)}")
+        finally:
+            self.identify_btn.setEnabled(True)
+
+    def ports_changed(self, added, removed):
+        """热插拔监视回调：增量更新设备列表，处理当前设备的拔出、重新插入和自动连接"""
+        try:
+            for port in removed:
+                index = self.device_selector.findData(port.device)
+                if index >= 0:
+                    self.device_selector.removeItem(index)
+                self.identities.pop(port.device, None)
+                self.response_display.append(f"设备已移除: {port.device}")
+                if self.session.is_open and port.device == self.session.transport.port:
+                    self.session.unplugged()
+
+            for port in added:
+                self.device_selector.addItem(f"{port.device} - {port.description}", port.device)
+                self.response_display.append(f"发现设备: {port.device} - {port.description}")
+                key = port_key(port)
+                if self.session.is_open:
+                    if key == self.connected_key:
+                        self.reconnect_device(port.device)
+                elif (key in self.known_devices and self.auto_connect_check.isChecked()
+                      and self.connect_btn.isEnabled()):
+                    self.response_display.append(f"自动连接已知设备: {port.device}")
+                    self.device_selector.setCurrentIndex(self.device_selector.findData(port.device))
+                    self.handle_connection()
+        except Exception as e:
+            self.response_display.append(f"更新设备列表错误: {str(e)}")
+
+    def reconnect_device(self, port):
+        """当前设备重新插入后立即重连（端口名可能改变）"""
+        start = time.perf_counter()
+
+        def done(online):
+            if online:
+                self.response_display.append(
+                    f"设备已重新连接: {port} (用时 {(time.perf_counter() - start) * 1000:.0f} ms)")
+                self.device_selector.setCurrentIndex(self.device_selector.findData(port))
+
+        self.session.replugged(port, done)
+
+    def selected_baudrate(self):
+        """当前选择的波特率，无效时返回 None"""
+        try:
+            return int(self.baud_selector.currentText())
+        except ValueError:
+            self.response_display.append("错误：请输入有效的波特率")
+            return None
 
     def handle_connection(self):
         """处理设备连接/断开"""
         try:
-            if self.ser is None:
+            if not self.session.is_open:
                 # 获取选中的端口
                 port = self.device_selector.currentText().split(' - ')[0]
                 if not port:
                     self.response_display.append("请选择一个设备")
                     return
+                baudrate = self.selected_baudrate()
+                if baudrate is None:
+                    return
+                negotiate = self.negotiate_check.isChecked()
 
-                # 连接设备
-                self.ser = serial.Serial(
-                    port=port,
-                    baudrate=115200,
-                    bytesize=serial.EIGHTBITS,
-                    parity=serial.PARITY_NONE,
-                    stopbits=serial.STOPBITS_ONE,
-                    timeout=0.5,  # 缩短超时时
-                    write_timeout=0.5,  # 添加超
-                    xonxoff=False,
-                    rtscts=False,
-                    dsrdtr=False
-                )
-
-                # 清空缓冲区
-                self.ser.reset_input_buffer()
-                self.ser.reset_output_buffer()
-
-                self.connect_btn.setText("断开")
-                self.response_display.append(f"已连接到设备: {port}")
-
-                # 等待设备初始化
-                import time
-                time.sleep(0.2)
-
-                # 发送初始化命令序列
-                init_commands = [
-                    "*CLS",  # 清除状态寄存器
-                    "*RST",  # 重置设备
-                    "SYST:REM",  # 切换到远程控制模式
-                ]
-
-                for cmd in init_commands:
-                    self.send_scpi_command(cmd)
-                    time.sleep(0.1)
+                def connect(transport):
+                    try:
+                        # 连接设备并发送初始化命令序列
+                        identity = transport.connect(port, baudrate=baudrate, timeout=TIMEOUT,
+                                                     negotiate=negotiate)
+                        if identity is None:
+                            return None
+                        # 预先加载校准参数，之后的 *RCL 直接读缓存
+                        transport.calibration.load(transport.send_batch, range(1, CAL_PARAM_COUNT + 1))
+                        return identity
+                    except Exception as e:
+                        transport.log(f"连接错误: {str(e)}")
+                        transport.close()
+                        return None
 
-                # 尝试获取设备标识
-                response = self.send_scpi_command("*IDN?")
-                if response:
+                def connected(response):
+                    self.connect_btn.setEnabled(True)
+                    if response is None:
+                        return
+                    self.connect_btn.setText("断开")
+                    # 记住设备标识：重新插入时自动重连，断开后可自动连接
+                    info = self.port_watcher.ports.get(port)
+                    self.connected_key = port_key(info) if info is not None else port
+                    self.known_devices.add(self.connected_key)
                     self.response_display.append(f"设备标识: {response}")
+                    self.baud_selector.setCurrentText(str(self.session.transport.baudrate))
 
-                # 初始化输出按钮状态
-                self.output_on_btn.setEnabled(True)
-                self.output_off_btn.setEnabled(False)
-
-                # 初始化校准按钮状态
-                self.cal_on_btn.setEnabled(True)
-                self.cal_off_btn.setEnabled(False)
-
-            else:
-                # 断开连接前发送本地控制命令
-                try:
-                    self.send_scpi_command("SYST:LOC")  # 切换到本地控制模式（如果设备持）
-                except:
-                    pass
-
-                self.ser.close()
-                self.ser = None
-                self.connect_btn.setText("连接")
-                self.response_display.append("已断开连接")
-
-                # 重置输出按钮状态
-                self.output_on_btn.setEnabled(True)
-                self.output_off_btn.setEnabled(False)
-
-                # 重置校准按钮状态
-                self.cal_on_btn.setEnabled(True)
-                self.cal_off_btn.setEnabled(False)
-        except Exception as e:
-            self.response_display.append(f"连接错误: {str(e)}")
-            if self.ser:
-                self.ser.close()
-                self.ser = None
-
-    def send_scpi_command(self, command):
-        """发送SCPI命令并获取响应"""
-        if not self.ser:
-            self.log_message("错误：未连接到设备")
-            return None
+                    # 初始化输出按钮状态
+                    self.output_on_btn.setEnabled(True)
+                    self.output_off_btn.setEnabled(False)
 
-        try:
-            if self.ser:
-                # 清空输入缓冲区
-                self.ser.reset_input_buffer()
+                    # 初始化校准按钮状态
+                    self.set_calibrating(False)
 
-                # 准备命令
-                command = command.strip() + "\r\n"  # 使用 \r\n 作为终止符
+                # 连接完成前禁止重复点击
+                self.connect_btn.setEnabled(False)
+                self.session.submit(connect, connected, "连接错误")
 
-                # 添加调试信息
-                self.response_display.append(f"发送命令: {command.strip()}")
+            else:
+                self.stop_monitor()
 
-                # 发送命令
-                self.ser.write(command.encode('ascii'))
-                self.ser.flush()
+                def disconnect(transport):
+                    # 断开连接前发送本地控制命令（断线时不再重连）
+                    try:
+                        if transport.online:
+                            transport.send("SYST:LOC")  # 切换到本地控制模式（如果设备持）
+                    except:
+                        pass
+                    transport.close()
+
+                def disconnected(result):
+                    self.connect_btn.setText("连接")
+                    self.connected_key = None
+                    self.response_display.append("已断开连接")
+
+                    # 重置输出按钮状态
+                    self.output_on_btn.setEnabled(True)
+                    self.output_off_btn.setEnabled(False)
 
-                # 如果是查询命令或RCL命令，等待响应
-                if "?" in command or command.strip().startswith("*RCL"):
-                    # 给设备响应时间
-                    import time
-                    time.sleep(0.1)
+                    # 重置校准按钮状态
+                    self.set_calibrating(False)
 
-                    # 读取响应
-                    try:
-                        # 首先尝试使用 ascii 解码
-                        raw_response = self.ser.readline()
-                        try:
-                            response = raw_response.decode('ascii').strip()
-                        except UnicodeDecodeError:
-                            # 如果 ascii 解码失败，尝试使用 utf-8
-                            try:
-                                response = raw_response.decode('utf-8').strip()
-                            except UnicodeDecodeError:
-                                # 如果 utf-8 也失败，尝试使用 gb2312/gbk
-                                try:
-                                    response = raw_response.decode('gb2312').strip()
-                                except UnicodeDecodeError:
-                                    response = raw_response.decode('gbk', errors='ignore').strip()
-
-                        if response:
-                            self.response_display.append(f"收到响应: {response}")
-                            # 检查是否是错误响应
-                            if response.startswith("**ERROR"):
-                                self.response_display.append("命令不被支持")
-                                return None
-                            return response
-                        else:
-                            self.response_display.append("警告：未收到响应")
-                            return None
-                    except Exception as e:
-                        self.response_display.append(f"读取响应错误: {str(e)}")
-                        # 如果所有解码方法都失败，返回十六进制格式的原始数据
-                        hex_response = ' '.join([f'{b:02x}' for b in raw_response])
-                        self.response_display.append(f"原始响应(hex): {hex_response}")
-                        return None
-                return "OK"  # 非查询命令返回OK
-            else:
-                self.response_display.append("错误：未连接到设备")
-                return None
+                self.session.submit(disconnect, disconnected, "连接错误")
         except Exception as e:
-            self.response_display.append(f"命令发送错误: {str(e)}")
-            return None
+            self.connect_btn.setEnabled(True)
+            self.response_display.append(f"连接错误: {str(e)}")
 
     def send_command(self):
         """用户界面的命令发送"""
@@ -643,34 +885,35 @@ class PowerSupplyControl(QMainWindow):
                     # 从命令中提取参数号
                     param_num = int(command.split("*RCL")[1].strip())
                     if 1 <= param_num <= 4:
+                        def show_param(response):
+                            if response:
+                                try:
+                                    # 提取数值部分（支持 NR1/NR2/NR3 格式）
+                                    param_value = parse_number(response)
+                                    if param_value is not None:
+                                        self.build_group("calibration")
+                                        # 根据参数编号显示对应的校准参数
+                                        if param_num == 1:
+                                            self.response_display.append(f"电压校准参数1 (最大值): {param_value:.6f}V")
+                                            self.voltage_cal1_input.setValue(param_value)
+                                        elif param_num == 2:
+                                            self.response_display.append(f"电压校准参数2 (最小值): {param_value:.6f}V")
+                                            self.voltage_cal2_input.setValue(param_value)
+                                        elif param_num == 3:
+                                            self.response_display.append(f"电流校准参数3 (40mA): {param_value:.6f}mA")
+                                            self.current_cal1_input.setValue(param_value)
+                                        elif param_num == 4:
+                                            self.response_display.append(f"电流校准参数4 (1mA): {param_value:.6f}mA")
+                                            self.current_cal2_input.setValue(param_value)
+                                    else:
+                                        self.response_display.append(f"错误：无法从响应中提取数值 - {response}")
+                                except ValueError as ve:
+                                    self.response_display.append(f"错误：数值转换失败 - {str(ve)}")
+                            else:
+                                self.response_display.append("错误：未收到有效响应")
+
                         # 发送命令并获取返回值
-                        response = self.send_scpi_command(command)
-                        if response:
-                            try:
-                                # 提取数值部分
-                                import re
-                                value_match = re.search(r'[-+]?\d*\.?\d+', response)
-                                if value_match:
-                                    param_value = float(value_match.group())
-                                    # 根据参数编号显示对应的校准参数
-                                    if param_num == 1:
-                                        self.response_display.append(f"电压校准参数1 (最大值): {param_value:.6f}V")
-                                        self.voltage_cal1_input.setValue(param_value)
-                                    elif param_num == 2:
-                                        self.response_display.append(f"电压校准参数2 (最小值): {param_value:.6f}V")
-                                        self.voltage_cal2_input.setValue(param_value)
-                                    elif param_num == 3:
-                                        self.response_display.append(f"电流校准参数3 (40mA): {param_value:.6f}mA")
-                                        self.current_cal1_input.setValue(param_value)
-                                    elif param_num == 4:
-                                        self.response_display.append(f"电流校准参数4 (1mA): {param_value:.6f}mA")
-                                        self.current_cal2_input.setValue(param_value)
-                                else:
-                                    self.response_display.append(f"错误：无法从响应中提取数值 - {response}")
-                            except ValueError as ve:
-                                self.response_display.append(f"错误：数值转换失败 - {str(ve)}")
-                        else:
-                            self.response_display.append("错误：未收到有效响应")
+                        self.session.command(command, show_param, "错误：命令执行失败")
                     else:
                         self.response_display.append("错误：参数范围应为1-4")
                 except ValueError:
@@ -678,31 +921,33 @@ class PowerSupplyControl(QMainWindow):
                 except Exception as e:
                     self.response_display.append(f"错误：命令执行失败 - {str(e)}")
             else:
+                def show_response(response):
+                    if response:
+                        self.response_display.append(f"响应: {response}")
+
                 # 处理其他命令
-                response = self.send_scpi_command(command)
-                if response:
-                    self.response_display.append(f"响应: {response}")
+                self.session.command(command, show_response, "错误")
 
             self.command_input.clear()
         except Exception as e:
             self.response_display.append(f"错误: {str(e)}")
 
-    def set_voltage(self):
+    @async_slot
+    async def set_voltage(self):
         """设置电压"""
         try:
-            if self.ser:
+            if self.session.is_open:
                 voltage = self.voltage_spinbox.value()
 
                 # 使用SCPI命令设置电压
-                self.send_scpi_command(f"SOURce:VOLTage:DC {voltage:.6f}")
+                await self.session.send(f"SOURce:VOLTage:DC {voltage:.6f}")
                 self.response_display.append(f"设置电压: {voltage:.6f}V")
 
-                # 等待一小段时间让设备稳定
-                import time
-                time.sleep(0.1)
+                # 等待一小段时间让设备稳定（不占用GUI和I/O线程）
+                await asyncio.sleep(0.1)
 
-                # 查询实际电压值
-                actual_voltage = self.query_voltage()
+                # 查询实际电压值（与同时进行的相同查询合并为一次往返，不是数值时为 None）
+                actual_voltage = await self.session.read("VOLT?", kind="float")
                 if actual_voltage is not None:
                     self.response_display.append(f"实际电压: {actual_voltage:.6f}V")
             else:
@@ -710,22 +955,22 @@ class PowerSupplyControl(QMainWindow):
         except Exception as e:
             self.response_display.append(f"设置电压错误: {str(e)}")
 
-    def set_current(self):
+    @async_slot
+    async def set_current(self):
         """设置电流"""
         try:
-            if self.ser:
+            if self.session.is_open:
                 current = self.current_spinbox.value()
 
                 # 用SCPI命令设置电流
-                self.send_scpi_command(f"SOURce:CURRent:DC {current:.6f}")
+                await self.session.send(f"SOURce:CURRent:DC {current:.6f}")
                 self.response_display.append(f"设置电流: {current:.6f}mA")
 
-                # 等待一小段时间让设备稳定
-                import time
-                time.sleep(0.1)
+                # 等待一小段时间让设备稳定（不占用GUI和I/O线程）
+                await asyncio.sleep(0.1)
 
-                # 查询实际电流值
-                actual_current = self.query_current()
+                # 查询实际电流值（与同时进行的相同查询合并为一次往返，不是数值时为 None）
+                actual_current = await self.session.read("CURR?", kind="float")
                 if actual_current is not None:
                     self.response_display.append(f"实际电流: {actual_current:.6f}mA")
             else:
@@ -733,16 +978,130 @@ class PowerSupplyControl(QMainWindow):
         except Exception as e:
             self.response_display.append(f"设置电流错误: {str(e)}")
 
+    def toggle_monitor(self):
+        """开始/停止实时监视"""
+        try:
+            if self.monitor.running:
+                self.stop_monitor()
+            elif self.session.is_open:
+                self.monitor.measure_temperature(self.monitor_temperature_check.isChecked())
+                self.monitor_temperature_check.setEnabled(False)
+                self.monitor.start(self.monitor_rate_spinbox.value())
+                self.monitor_timer.start()
+                self.monitor_btn.setText("停止监视")
+                self.response_display.append(f"开始实时监视: 目标采样率 {self.monitor.rate:.1f} Hz")
+            else:
+                self.response_display.append("错误：未连接到仪器")
+        except Exception as e:
+            self.response_display.append(f"实时监视错误: {str(e)}")
+
+    def stop_monitor(self):
+        """停止实时监视并报告采样统计"""
+        if not self.monitor.running:
+            return
+        rate, jitter = self.monitor.stats()
+        self.monitor.stop()
+        self.monitor_timer.stop()
+        self.update_monitor_display()
+        self.monitor_btn.setText("开始监视")
+        self.monitor_temperature_check.setEnabled(True)
+        self.response_display.append(
+            f"停止实时监视: {self.monitor.count} 个样本, 失败 {self.monitor.errors} 次, "
+            f"实际采样率 {rate:.1f} Hz, 抖动 {jitter:.2f} ms")
+        for name, label, unit in (("voltage", "电压", "V"), ("current", "电流", "mA")):
+            stats = self.store.statistics(name)
+            if stats["count"]:
+                self.response_display.append(
+                    f"{label}: 平均 {stats['mean']:.6f}{unit}, 标准差 {stats['std']:.6f}{unit}, "
+                    f"范围 {stats['min']:.6f} ~ {stats['max']:.6f}{unit} (最近 {stats['count']} 个样本)")
+
+    def record_samples(self, samples):
+        """保存实时监视的一批样本并刷新曲线"""
+        self.store.append(samples, self.monitor.columns)
+        self.trace_buffer.append(samples)
+        if self.recorder is not None:
+            try:
+                self.recorder.write(samples, self.monitor.columns)
+            except OSError as e:
+                self.response_display.append(f"录制错误: {str(e)}")
+                self.stop_recording()
+        if "plot" in self.groups:
+            self.trace_plot.update()
+
+    def toggle_recording(self):
+        """开始/停止把实时监视的样本录制到文件"""
+        try:
+            if self.recorder is not None:
+                self.stop_recording()
+                return
+            if not self.session.is_open:
+                self.response_display.append("错误：未连接到仪器")
+                return
+            path, _ = QFileDialog.getSaveFileName(
+                self, "保存录制文件", time.strftime("session_%Y%m%d_%H%M%S.rec"), "录制文件 (*.rec)")
+            if not path:
+                return
+
+            def job(transport):
+                # *IDN? 和 *RCL 都命中连接时建立的缓存（send_batch 先查缓存），通常不访问设备
+                identity = transport.send("*IDN?") or ""
+                table = download_calibration(transport.send_batch, CAL_PARAM_COUNT, transport.calibration)
+                return identity, table, transport.port, transport.baudrate
+
+            def started(result):
+                identity, table, port, baudrate = result
+                if self.recorder is not None:
+                    return
+                try:
+                    self.recorder = SessionRecorder(path, identity, table,
+                                                    metadata={"port": port, "baudrate": baudrate})
+                except OSError as e:
+                    self.response_display.append(f"录制错误: {str(e)}")
+                    return
+                self.record_btn.setText("停止录制")
+                self.response_display.append(f"开始录制: {path}")
+
+            self.session.submit(job, started, "录制错误")
+        except Exception as e:
+            self.response_display.append(f"录制错误: {str(e)}")
+
+    def stop_recording(self):
+        """停止录制（写完已提交的样本后关闭文件）"""
+        if self.recorder is None:
+            return
+        recorder, self.recorder = self.recorder, None
+        recorder.close()
+        self.record_btn.setText("开始录制")
+        self.response_display.append(
+            f"停止录制: {recorder.records} 条记录, {recorder.bytes_written / 1e6:.2f} MB, {recorder.path}")
+
+    def set_monitor_rate(self, rate):
+        """修改目标采样率（监视中立即生效）"""
+        self.monitor.rate = rate
+
+    def update_monitor_display(self):
+        """刷新实时监视的读数和采样统计"""
+        sample = self.store.latest()
+        if sample is not None:
+            self.monitor_voltage_label.setText(f"电压: {sample['voltage']:.6f}V")
+            self.monitor_current_label.setText(f"电流: {sample['current']:.6f}mA")
+            if sample["temperature"] == sample["temperature"]:  # 未采样温度时为 NaN
+                self.monitor_temperature_label.setText(f"温度: {sample['temperature']:.1f}°C")
+        rate, jitter = self.monitor.stats()
+        self.monitor_rate_label.setText(f"采样率: {rate:.1f} Hz, 抖动 {jitter:.2f} ms")
+
     def turn_output_on(self):
         """打开输出"""
         try:
-            if self.ser:
-                result = self.send_scpi_command("OUTPut:STATe ON")
-                if result is not None:
-                    self.response_display.append("输出已打开")
-                    # 更新按钮状态
-                    self.output_on_btn.setEnabled(False)
-                    self.output_off_btn.setEnabled(True)
+            if self.session.is_open:
+                def done(result):
+                    if result is not None:
+                        self.response_display.append("输出已打开")
+                        # 更新按钮状态
+                        self.output_on_btn.setEnabled(False)
+                        self.output_off_btn.setEnabled(True)
+
+                self.session.command("OUTPut:STATe ON", done, "输出控制错误")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -751,45 +1110,112 @@ class PowerSupplyControl(QMainWindow):
     def turn_output_off(self):
         """关闭输出"""
         try:
-            if self.ser:
-                result = self.send_scpi_command("OUTPut:STATe OFF")
-                if result is not None:
-                    self.response_display.append("输出已关闭")
-                    # 更新按钮状态
-                    self.output_on_btn.setEnabled(True)
-                    self.output_off_btn.setEnabled(False)
+            if self.session.is_open:
+                def done(result):
+                    if result is not None:
+                        # 紧急命令插队执行，显示排队等待时间
+                        self.response_display.append(f"输出已关闭 (排队 {future.queue_wait * 1000:.1f} ms)")
+                        # 更新按钮状态
+                        self.output_on_btn.setEnabled(True)
+                        self.output_off_btn.setEnabled(False)
+
+                future = self.session.command("OUTPut:STATe OFF", done, "输出控制错误")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
             self.response_display.append(f"输出控制错误: {str(e)}")
 
+    @async_slot
+    async def connect_all_devices(self):
+        """连接设备列表中的全部设备（单机会话已占用的端口除外）"""
+        try:
+            ports = [self.device_selector.itemText(i).split(' - ')[0]
+                     for i in range(self.device_selector.count())]
+            ports = [port for port in ports
+                     if port and port != self.session.transport.port and port not in self.manager.sessions]
+            if not ports:
+                self.response_display.append("没有可连接的设备")
+                return
+            baudrate = self.selected_baudrate()
+            if baudrate is None:
+                return
+
+            self.connect_all_btn.setEnabled(False)
+            identities = await self.manager.connect_all(ports, baudrate, TIMEOUT,
+                                                        self.negotiate_check.isChecked())
+            for port, idn in identities.items():
+                self.response_display.append(f"{port} 设备标识: {idn}")
+        except Exception as e:
+            self.response_display.append(f"连接全部设备错误: {str(e)}")
+        finally:
+            self.connect_all_btn.setEnabled(True)
+            self.device_count_label.setText(f"已连接: {len(self.manager.sessions)} 台")
+
+    @async_slot
+    async def set_voltage_all(self):
+        """所有已连接仪器设置同一电压"""
+        try:
+            if self.manager.sessions:
+                voltage = self.voltage_spinbox.value()
+                results = await self.manager.set_voltage_all(voltage)
+                done = sum(1 for result in results.values() if result is not None)
+                self.response_display.append(f"全部设置电压: {voltage:.6f}V ({done}/{len(results)} 台成功)")
+            else:
+                self.response_display.append("错误：未连接多台仪器")
+        except Exception as e:
+            self.response_display.append(f"全部设置电压错误: {str(e)}")
+
+    @async_slot
+    async def read_current_all(self):
+        """并发读取所有已连接仪器的电流"""
+        try:
+            if self.manager.sessions:
+                responses = await self.manager.query_all("CURR?")
+                for port, response in responses.items():
+                    self.response_display.append(f"{port} 电流: {response}")
+            else:
+                self.response_display.append("错误：未连接多台仪器")
+        except Exception as e:
+            self.response_display.append(f"全部读取电流错误: {str(e)}")
+
+    @async_slot
+    async def disconnect_all_devices(self):
+        """断开全部多仪器连接"""
+        try:
+            await self.manager.disconnect_all()
+            self.response_display.append("已断开全部设备")
+        except Exception as e:
+            self.response_display.append(f"断开全部错误: {str(e)}")
+        finally:
+            self.device_count_label.setText(f"已连接: {len(self.manager.sessions)} 台")
+
     def set_limits(self):
         """设置电压和电流的上下限"""
         try:
-            if self.ser:
-                # 设置电压上限
+            if self.session.is_open:
                 volt_upper = self.voltage_upper_limit.value()
-                self.send_scpi_command(f"SOURce:VOLTage:ULIMit {volt_upper:.6f}")
-
-                # 设置电压下限
                 volt_lower = self.voltage_lower_limit.value()
-                self.send_scpi_command(f"SOURce:VOLTage:LLIMit {volt_lower:.6f}")
-
-                # 设置电流上限
                 curr_upper = self.current_upper_limit.value()
-                self.send_scpi_command(f"SOURce:CURRent:ULIMit {curr_upper:.6f}")
-
-                # 设置电流下限
                 curr_lower = self.current_lower_limit.value()
-                self.send_scpi_command(f"SOURce:CURRent:LLIMit {curr_lower:.6f}")
 
-                self.response_display.append(
-                    f"设置限制值:\n"
-                    f"电压上限: {volt_upper:.6f}V\n"
-                    f"电压下限: {volt_lower:.6f}V\n"
-                    f"电流上限: {curr_upper:.6f}mA\n"
-                    f"电流下限: {curr_lower:.6f}mA"
-                )
+                limit_commands = [
+                    f"SOURce:VOLTage:ULIMit {volt_upper:.6f}",  # 设置电压上限
+                    f"SOURce:VOLTage:LLIMit {volt_lower:.6f}",  # 设置电压下限
+                    f"SOURce:CURRent:ULIMit {curr_upper:.6f}",  # 设置电流上限
+                    f"SOURce:CURRent:LLIMit {curr_lower:.6f}",  # 设置电流下限
+                ]
+
+                def done(results):
+                    self.response_display.append(
+                        f"设置限制值:\n"
+                        f"电压上限: {volt_upper:.6f}V\n"
+                        f"电压下限: {volt_lower:.6f}V\n"
+                        f"电流上限: {curr_upper:.6f}mA\n"
+                        f"电流下限: {curr_lower:.6f}mA"
+                    )
+
+                # 四条限值命令合并发送
+                self.session.batch(limit_commands, done, "设置限值错误")
 
                 # # 查询设置结果
                 # v_upper = self.send_scpi_command("SOURce:VOLTage:ULIMit?")
@@ -810,11 +1236,12 @@ class PowerSupplyControl(QMainWindow):
         except Exception as e:
             self.response_display.append(f"设置限值错误: {str(e)}")
 
-    def query_firmware(self):
+    @async_slot
+    async def query_firmware(self):
         """查询固件版本"""
         try:
-            if self.ser:
-                response = self.send_scpi_command("SYST:FIRM?")
+            if self.session.is_open:
+                response = await self.session.send("SYST:FIRM?")
                 if response:
                     self.response_display.append(f"固件版本: {response}")
             else:
@@ -822,18 +1249,17 @@ class PowerSupplyControl(QMainWindow):
         except Exception as e:
             self.response_display.append(f"查询固件版本错误: {str(e)}")
 
-    def query_temperature(self):
+    @async_slot
+    async def query_temperature(self):
         """查询系统温度"""
         try:
-            if self.ser:
-                response = self.send_scpi_command("SYST:TEMP?")
+            if self.session.is_open:
+                response = await self.session.read("SYST:TEMP?")
                 if response:
                     try:
-                        # 尝试提取数字部分
-                        import re
-                        temp_match = re.search(r'[-+]?\d*\.?\d+', response)
-                        if temp_match:
-                            temp = float(temp_match.group())
+                        # 尝试提取数字部分（支持 NR1/NR2/NR3 格式）
+                        temp = parse_number(response)
+                        if temp is not None:
                             self.response_display.append(f"系统温度: {temp:.1f}°C")
                         else:
                             self.response_display.append(f"无法解析温度值: {response}")
@@ -954,10 +1380,13 @@ class PowerSupplyControl(QMainWindow):
     def set_voltage_upper_limit(self):
         """设置电压上限"""
         try:
-            if self.ser:
+            if self.session.is_open:
                 volt_upper = self.voltage_upper_limit.value()
-                self.send_scpi_command(f"SOUR:VOLT:ULIM {volt_upper:.6f}")
-                self.response_display.append(f"设置电压上限: {volt_upper:.6f}V")
+                self.session.command(
+                    f"SOUR:VOLT:ULIM {volt_upper:.6f}",
+                    lambda result: self.response_display.append(f"设置电压上限: {volt_upper:.6f}V"),
+                    "设置电压上限错误"
+                )
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -966,10 +1395,13 @@ class PowerSupplyControl(QMainWindow):
     def set_voltage_lower_limit(self):
         """设置电压下限"""
         try:
-            if self.ser:
+            if self.session.is_open:
                 volt_lower = self.voltage_lower_limit.value()
-                self.send_scpi_command(f"SOURce:VOLTage:LLIMit {volt_lower:.6f}")
-                self.response_display.append(f"设置电压下限: {volt_lower:.6f}V")
+                self.session.command(
+                    f"SOURce:VOLTage:LLIMit {volt_lower:.6f}",
+                    lambda result: self.response_display.append(f"设置电压下限: {volt_lower:.6f}V"),
+                    "设置电压下限错误"
+                )
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -978,10 +1410,13 @@ class PowerSupplyControl(QMainWindow):
     def set_current_upper_limit(self):
         """设置电流上限"""
         try:
-            if self.ser:
+            if self.session.is_open:
                 curr_upper = self.current_upper_limit.value()
-                self.send_scpi_command(f"SOURce:CURRent:ULIMit {curr_upper:.6f}")
-                self.response_display.append(f"设置电流上限: {curr_upper:.6f}mA")
+                self.session.command(
+                    f"SOURce:CURRent:ULIMit {curr_upper:.6f}",
+                    lambda result: self.response_display.append(f"设置电流上限: {curr_upper:.6f}mA"),
+                    "设置电流上限错误"
+                )
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -990,10 +1425,13 @@ class PowerSupplyControl(QMainWindow):
     def set_current_lower_limit(self):
         """设置电流下限"""
         try:
-            if self.ser:
+            if self.session.is_open:
                 curr_lower = self.current_lower_limit.value()
-                self.send_scpi_command(f"SOURce:CURRent:LLIMit {curr_lower:.6f}")
-                self.response_display.append(f"设置电流下限: {curr_lower:.6f}mA")
+                self.session.command(
+                    f"SOURce:CURRent:LLIMit {curr_lower:.6f}",
+                    lambda result: self.response_display.append(f"设置电流下限: {curr_lower:.6f}mA"),
+                    "设置电流下限错误"
+                )
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
@@ -1002,80 +1440,39 @@ class PowerSupplyControl(QMainWindow):
     def query_calibration_params(self):
         """查询所有校准参数"""
         try:
-            if self.ser:
-                # 查询所有校准参数
-                params = []
-                for i in range(1, 5):
-                    response = self.send_scpi_command(f"*RCL {i}")
-                    if response:
-                        params.append(float(response))
-                    else:
-                        params.append(None)
-
-                # 在UI上显示参数
-                self.response_display.append("\n校准参数查询结果:")
-                if params[0] is not None:
-                    self.response_display.append(f"电压校准参数1: {params[0]:.6f}V")
-                    self.voltage_cal1_input.setValue(params[0])
-                if params[1] is not None:
-                    self.response_display.append(f"电压校准参数2: {params[1]:.6f}V")
-                    self.voltage_cal2_input.setValue(params[1])
-                if params[2] is not None:
-                    self.response_display.append(f"电流校准参数3: {params[2]:.6f}mA")
-                    self.current_cal1_input.setValue(params[2])
-                if params[3] is not None:
-                    self.response_display.append(f"电流校准参数4: {params[3]:.6f}mA")
-                    self.current_cal2_input.setValue(params[3])
+            if self.session.is_open:
+                def job(transport):
+                    # 一次复合请求读取所有校准参数
+                    return download_calibration(transport.send_batch, CAL_PARAM_COUNT, transport.calibration)
+
+                def done(table):
+                    params = [table.get(index) for index in range(1, len(table) + 1)]
+                    self.build_group("calibration")
+                    # 在UI上显示参数
+                    self.response_display.append(f"\n校准参数查询结果 (用时 {table.elapsed * 1000:.1f} ms):")
+                    if params[0] is not None:
+                        self.response_display.append(f"电压校准参数1: {params[0]:.6f}V")
+                        self.voltage_cal1_input.setValue(params[0])
+                    if params[1] is not None:
+                        self.response_display.append(f"电压校准参数2: {params[1]:.6f}V")
+                        self.voltage_cal2_input.setValue(params[1])
+                    if params[2] is not None:
+                        self.response_display.append(f"电流校准参数3: {params[2]:.6f}mA")
+                        self.current_cal1_input.setValue(params[2])
+                    if params[3] is not None:
+                        self.response_display.append(f"电流校准参数4: {params[3]:.6f}mA")
+                        self.current_cal2_input.setValue(params[3])
+
+                self.session.submit(job, done, "查询校准参数错误")
             else:
                 self.response_display.append("错误：未连接到仪器")
         except Exception as e:
             self.response_display.append(f"查询校准参数错误: {str(e)}")
 
-    def query_voltage(self):
-        """查询实际电压值"""
-        try:
-            if self.ser:
-                response = self.send_scpi_command("VOLT?")
-                if response:
-                    try:
-                        # 提取数值部分
-                        import re
-                        value_match = re.search(r'[-+]?\d*\.?\d+', response)
-                        if value_match:
-                            voltage = float(value_match.group())
-                            return voltage
-                    except ValueError:
-                        self.response_display.append("电压值解析错误")
-                return None
-            return None
-        except Exception as e:
-            self.response_display.append(f"电压查询错误: {str(e)}")
-            return None
-
-    def query_current(self):
-        """查询实际电流值"""
-        try:
-            if self.ser:
-                response = self.send_scpi_command("CURR?")
-                if response:
-                    try:
-                        # 提取数值部分
-                        import re
-                        value_match = re.search(r'[-+]?\d*\.?\d+', response)
-                        if value_match:
-                            current = float(value_match.group())
-                            return current
-                    except ValueError:
-                        self.response_display.append("电流值解析错误")
-                return None
-            return None
-        except Exception as e:
-            self.response_display.append(f"电流查询错误: {str(e)}")
-            return None
-
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = PowerSupplyControl()
     window.show()
-    sys.exit(app.exec())
+    # 在 QtAsyncio 事件循环中运行，使协程槽函数可以直接 await 会话
+    QtAsyncio.run(handle_sigint=True)